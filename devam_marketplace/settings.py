@@ -89,6 +89,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'devam_marketplace.wsgi.application'
 
+# Discards buffered log rows before the test databases go away
+TEST_RUNNER = 'devam_marketplace.test_runner.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -106,6 +109,30 @@ else:
         }
     }
 
+# Cache shared by every worker process: the catalog version, search facets and
+# result ids, autocomplete and download resume windows all rely on it.
+# REDIS_URL selects Redis (needs the redis package); otherwise a database table,
+# which `manage.py migrate` creates (projects.apps).
+if config('REDIS_URL', default=None):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Trigram lookups used by fuzzy search (projects.fuzzy)
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    INSTALLED_APPS.append('django.contrib.postgres')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -171,6 +198,8 @@ SESSION_SAVE_EVERY_REQUEST = True
 # Razorpay settings
 RAZORPAY_KEY_ID = config('RAZORPAY_KEY_ID', default='')
 RAZORPAY_KEY_SECRET = config('RAZORPAY_KEY_SECRET', default='')
+# Override the Razorpay API host, e.g. http://127.0.0.1:8001/v1 for a local stub gateway
+RAZORPAY_API_BASE_URL = config('RAZORPAY_API_BASE_URL', default='')
 
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -203,6 +232,31 @@ if not DEBUG:
     # Use compressed manifest storage for static files
     STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Protected downloads: '' streams through Django, 'x-accel-redirect' hands the
+# transfer to nginx (internal location at DOWNLOAD_ACCEL_PREFIX mapped to MEDIA_ROOT)
+# and 'x-sendfile' to Apache/lighttpd
+DOWNLOAD_OFFLOAD = config('DOWNLOAD_OFFLOAD', default='')
+DOWNLOAD_ACCEL_PREFIX = config('DOWNLOAD_ACCEL_PREFIX', default='/protected-media/')
+
+# Order deliverables in a private S3-compatible bucket (empty keeps them in MEDIA_ROOT).
+# AWS_S3_ENDPOINT_URL points at a non-AWS endpoint, e.g. http://127.0.0.1:9000 for MinIO
+DELIVERY_STORAGE_BUCKET = config('DELIVERY_STORAGE_BUCKET', default='')
+AWS_ACCESS_KEY_ID = config('AWS_ACCESS_KEY_ID', default='')
+AWS_SECRET_ACCESS_KEY = config('AWS_SECRET_ACCESS_KEY', default='')
+AWS_S3_REGION_NAME = config('AWS_S3_REGION_NAME', default=None)
+AWS_S3_ENDPOINT_URL = config('AWS_S3_ENDPOINT_URL', default=None)
+# Lifetime of signed download URLs, in seconds
+DELIVERY_URL_EXPIRY = config('DELIVERY_URL_EXPIRY', default=300, cast=int)
+
+# Serve external image URLs (e.g. Google Drive links) through /images/proxy/, which
+# fetches each image once with IMAGE_PROXY_FETCHER (any callable taking a URL and
+# returning bytes) and serves the processed copy with long-lived cache headers
+IMAGE_PROXY_ENABLED = config('IMAGE_PROXY_ENABLED', default=False, cast=bool)
+IMAGE_PROXY_FETCHER = config('IMAGE_PROXY_FETCHER', default='projects.proxy.fetch_url')
+IMAGE_PROXY_MAX_AGE = config('IMAGE_PROXY_MAX_AGE', default=7 * 24 * 3600, cast=int)
+IMAGE_PROXY_MAX_BYTES = config('IMAGE_PROXY_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+IMAGE_PROXY_TIMEOUT = config('IMAGE_PROXY_TIMEOUT', default=10, cast=int)
+
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
@@ -0,0 +1,16 @@
+from django.test.runner import DiscoverRunner
+
+from orders.buffers import BatchedWriter
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Drops log rows still buffered in memory (orders.buffers) before the test
+    databases are destroyed, so the flush at exit can't write them into the
+    database `default` points at outside tests.
+    """
+
+    def teardown_databases(self, old_config, **kwargs):
+        for writer in BatchedWriter.instances:
+            writer.discard()
+        super().teardown_databases(old_config, **kwargs)
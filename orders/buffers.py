@@ -0,0 +1,87 @@
+import atexit
+import logging
+import threading
+from collections import deque
+
+from django.db import close_old_connections
+
+from .models import DownloadLog
+
+
+logger = logging.getLogger(__name__)
+
+
+class BatchedWriter:
+    """
+    Buffer unsaved model instances in memory and bulk_create them from a
+    background thread, keeping log inserts off the request path.
+
+    A batch is written every flush_interval seconds, or sooner once
+    batch_size rows are waiting. Whatever is left is flushed at exit.
+
+    With max_pending set the buffer is a ring: if the database falls that
+    far behind, the oldest unwritten rows are dropped rather than memory
+    growing without bound.
+    """
+    # Every writer created, so the test runner can discard what they hold
+    instances = []
+
+    def __init__(self, model, batch_size=100, flush_interval=5.0, max_pending=None):
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = deque(maxlen=max_pending)
+        self._overwritten = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        BatchedWriter.instances.append(self)
+        atexit.register(self.flush)
+
+    def add(self, instance):
+        with self._lock:
+            if len(self._pending) == self.max_pending:
+                self._overwritten += 1
+            self._pending.append(instance)
+            full = len(self._pending) >= self.batch_size
+            if self._thread is None or not self._thread.is_alive():
+                # Started lazily so forked server workers each get their own thread
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name=f'{self.model.__name__}-writer',
+                    daemon=True,
+                )
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def discard(self):
+        """Drop the rows not yet written; returns how many there were"""
+        with self._lock:
+            dropped, self._pending = len(self._pending), deque(maxlen=self.max_pending)
+            self._overwritten = 0
+        return dropped
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = list(self._pending), deque(maxlen=self.max_pending)
+            overwritten, self._overwritten = self._overwritten, 0
+        if overwritten:
+            logger.warning('Buffer full, dropped the %d oldest %s rows', overwritten, self.model.__name__)
+        if not batch:
+            return
+        close_old_connections()
+        try:
+            self.model.objects.bulk_create(batch, batch_size=self.batch_size)
+        except Exception:
+            logger.exception('Dropped %d buffered %s rows', len(batch), self.model.__name__)
+
+
+download_logs = BatchedWriter(DownloadLog)
@@ -0,0 +1,239 @@
+import hashlib
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+# Seconds after claiming a download during which the same client may
+# resume it with Range requests without using up another download
+RESUME_WINDOW = 60 * 60
+
+
+def delivery_storage():
+    """
+    Storage for order deliverables.
+
+    Uses a private S3-compatible bucket when DELIVERY_STORAGE_BUCKET is set
+    (AWS_S3_ENDPOINT_URL can point at MinIO or another local stand-in),
+    otherwise the default media storage.
+    """
+    if not settings.DELIVERY_STORAGE_BUCKET:
+        return default_storage
+
+    from storages.backends.s3 import S3Storage
+    return S3Storage(
+        bucket_name=settings.DELIVERY_STORAGE_BUCKET,
+        default_acl='private',
+        querystring_auth=True,
+        file_overwrite=False,
+    )
+
+
+def presigned_download_url(field_file, filename):
+    """
+    Return a short-lived signed URL for a deliverable in S3-compatible storage.
+
+    The URL is signed once and cached until shortly before it expires, so
+    repeated downloads reuse it. Returns None for storage that can't sign
+    URLs, in which case the file is served by serve_file instead.
+    """
+    from storages.backends.s3 import S3Storage
+    if not isinstance(field_file.storage, S3Storage):
+        return None
+
+    expiry = settings.DELIVERY_URL_EXPIRY
+    digest = hashlib.sha256(f'{field_file.name}|{filename}'.encode()).hexdigest()
+    cache_key = f'delivery_url:{digest}'
+    url = cache.get(cache_key)
+    if url is None:
+        url = field_file.storage.url(
+            field_file.name,
+            parameters={'ResponseContentDisposition': content_disposition_header(True, filename)},
+            expire=expiry,
+        )
+        # Stop handing the URL out well before S3 starts rejecting it
+        cache.set(cache_key, url, timeout=expiry - min(60, expiry // 5))
+    return url
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header into an inclusive (start, end) pair.
+
+    Returns None when the whole file should be sent (no header, or a form we
+    don't serve partially such as multiple ranges). Raises ValueError when
+    the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+
+def is_resumed_download(request):
+    """True when the client is continuing a download rather than starting one"""
+    match = RANGE_RE.match(request.headers.get('Range', '').strip())
+    return bool(match and match.group(1) and int(match.group(1)) > 0)
+
+
+def resume_key(order_item, request):
+    return f"download_resume:{order_item.pk}:{request.META.get('REMOTE_ADDR')}"
+
+
+def grant_resume(order_item, request):
+    """Let this client resume the download it just claimed for RESUME_WINDOW seconds"""
+    cache.set(resume_key(order_item, request), True, timeout=RESUME_WINDOW)
+
+
+def resume_granted(order_item, request):
+    """
+    True when the request continues a download this client claimed within
+    RESUME_WINDOW. A Range header alone isn't enough: otherwise `bytes=0-0`
+    followed by `bytes=1-` would fetch the whole file without using a download.
+    """
+    return is_resumed_download(request) and cache.get(resume_key(order_item, request), False)
+
+
+def file_validators(field_file):
+    """Return (size, last_modified timestamp, ETag) for a stored file"""
+    size = field_file.size
+    try:
+        last_modified = int(field_file.storage.get_modified_time(field_file.name).timestamp())
+    except (NotImplementedError, OSError):
+        last_modified = None
+
+    if last_modified is not None:
+        etag = f'"{size:x}-{last_modified:x}"'
+    else:
+        etag = f'"{size:x}"'
+    return size, last_modified, etag
+
+
+def if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return last_modified is not None and parse_http_date_safe(if_range) == last_modified
+
+
+def offload_response(field_file, filename):
+    """
+    Hand the transfer to the front-end web server when DOWNLOAD_OFFLOAD is set.
+
+    Django only authorizes the request; nginx (X-Accel-Redirect) or
+    Apache/lighttpd (X-Sendfile) stream the bytes and handle Range themselves.
+    """
+    mode = settings.DOWNLOAD_OFFLOAD
+    if mode == 'x-accel-redirect':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = f"{settings.DOWNLOAD_ACCEL_PREFIX.rstrip('/')}/{quote(field_file.name)}"
+    elif mode == 'x-sendfile':
+        try:
+            path = field_file.path
+        except NotImplementedError:
+            # Remote storage has no local path for the web server to send
+            return None
+        response = HttpResponse()
+        response['X-Sendfile'] = path
+    else:
+        return None
+
+    response['Content-Type'] = 'application/octet-stream'
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+def iter_range(file, start, end):
+    try:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def serve_file(request, field_file, filename, claim=None):
+    """
+    Stream a stored file as an attachment without loading it into memory.
+
+    Supports single byte ranges (206) for resumable downloads and answers
+    conditional requests from its ETag/Last-Modified validators.
+
+    `claim`, if given, is called only once a body (200 or 206) is going to
+    be sent, so a 304 or 416 doesn't use up a download. If it returns False
+    nothing is sent and serve_file returns None.
+    """
+    response = offload_response(field_file, filename)
+    if response is not None:
+        # The web server answers Range and conditional requests itself
+        if claim is not None and not claim():
+            return None
+        return response
+
+    size, last_modified, etag = file_validators(field_file)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    byte_range = None
+    if if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if claim is not None and not claim():
+        return None
+
+    if byte_range is None:
+        response = FileResponse(field_file.open('rb'), as_attachment=True, filename=filename)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            iter_range(field_file.open('rb'), start, end),
+            status=206,
+            content_type='application/octet-stream',
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
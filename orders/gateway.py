@@ -0,0 +1,19 @@
+from django.conf import settings
+import razorpay
+
+
+def get_razorpay_client():
+    """
+    Build a Razorpay client from settings.
+
+    RAZORPAY_API_BASE_URL points the client at a different API host (e.g. a
+    local stub gateway during development); when unset the library default
+    is used.
+    """
+    options = {}
+    if settings.RAZORPAY_API_BASE_URL:
+        options['base_url'] = settings.RAZORPAY_API_BASE_URL
+    return razorpay.Client(
+        auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET),
+        **options
+    )
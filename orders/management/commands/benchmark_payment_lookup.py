@@ -0,0 +1,88 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the payment callback lookup (Order by razorpay_order_id) with and without '
+        'the gateway identifier index, in a throwaway database created and dropped for the run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1_000_000, help='Orders to seed')
+        parser.add_argument('--lookups', type=int, default=2000, help='Callback lookups to time')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Replace a leftover benchmark database without asking')
+
+    def handle(self, *args, **options):
+        # The test database machinery makes a fresh, migrated database next to
+        # the configured one (test_<NAME>, in memory for SQLite) and drops it
+        # afterwards, so the real data and schema are never touched
+        creation = connection.creation
+        old_name = creation.create_test_db(verbosity=0, autoclobber=not options['interactive'])
+        try:
+            self.benchmark(options['orders'], options['lookups'], options['batch_size'])
+        finally:
+            creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(self.style.SUCCESS('Benchmark database dropped'))
+
+    def benchmark(self, count, lookups, batch_size):
+        self.seed_orders(count, batch_size)
+
+        candidates = [i for i in random.sample(range(count), min(count, lookups * 2)) if i % 3]
+        order_ids = [f'order_{i:014d}' for i in candidates[:lookups]]
+
+        constraint = next(c for c in Order._meta.constraints if c.name == 'unique_order_razorpay_order_id')
+        with connection.schema_editor() as editor:
+            editor.remove_constraint(Order, constraint)
+        before = self.time_lookups(order_ids)
+        with connection.schema_editor() as editor:
+            editor.add_constraint(Order, constraint)
+        after = self.time_lookups(order_ids)
+
+        self.stdout.write(f'\n{len(order_ids)} lookups over {count:,} orders ({connection.vendor})')
+        self.stdout.write(f"{'':10}{'mean':>12}{'p50':>12}{'p99':>12}")
+        for label, result in (('no index', before), ('indexed', after)):
+            self.stdout.write(
+                f"{label:10}{result['mean_ms']:>10.3f}ms{result['p50_ms']:>10.3f}ms{result['p99_ms']:>10.3f}ms"
+            )
+        self.stdout.write(f"Speed-up (mean): {before['mean_ms'] / after['mean_ms']:.0f}x")
+
+    def seed_orders(self, count, batch_size):
+        user = User.objects.create(username='benchmark')
+        self.stdout.write(f'Seeding {count:,} orders...')
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            Order.objects.bulk_create([
+                Order(
+                    user=user,
+                    total_amount=100,
+                    customer_name='Benchmark',
+                    customer_email='bench@example.com',
+                    # Roughly a third of orders never reach the gateway
+                    razorpay_order_id=f'order_{i:014d}' if i % 3 else None,
+                    razorpay_payment_id=f'pay_{i:014d}' if i % 3 else None,
+                )
+                for i in range(offset, min(offset + batch_size, count))
+            ])
+        self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+    def time_lookups(self, order_ids):
+        timings = []
+        for order_id in order_ids:
+            started = time.perf_counter()
+            Order.objects.get(razorpay_order_id=order_id)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return {
+            'mean_ms': sum(timings) / len(timings) * 1000,
+            'p50_ms': timings[len(timings) // 2] * 1000,
+            'p99_ms': timings[int(len(timings) * 0.99)] * 1000,
+        }
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+from orders.models import Order, OrderItem
+from projects.models import CatalogEntry, Category, Project
+
+
+class Command(BaseCommand):
+    help = 'Recompute Project.units_sold/revenue from paid orders, the Category counters and catalog sales ranks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Projects per bulk update')
+
+    def handle(self, *args, **options):
+        line_total = ExpressionWrapper(
+            F('project_price') * F('quantity'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+        with transaction.atomic():
+            totals = {
+                row['project_id']: row
+                for row in OrderItem.objects.filter(order__payment_status='completed')
+                .values('project_id')
+                .annotate(units=Sum('quantity'), amount=Sum(line_total))
+            }
+
+            changed = []
+            for project in Project.objects.only('id', 'units_sold', 'revenue').iterator(chunk_size=options['batch_size']):
+                row = totals.get(project.id, {})
+                units, amount = row.get('units') or 0, row.get('amount') or 0
+                if (project.units_sold, project.revenue) != (units, amount):
+                    project.units_sold, project.revenue = units, amount
+                    changed.append(project)
+            Project.objects.bulk_update(changed, ['units_sold', 'revenue'], batch_size=options['batch_size'])
+            categories = Category.recount_counters()
+            ranked = CatalogEntry.rank(batch_size=options['batch_size'])
+
+            Order.objects.filter(payment_status='completed', sales_counted=False).update(sales_counted=True)
+            Order.objects.exclude(payment_status='completed').filter(sales_counted=True).update(sales_counted=False)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales counters ({len(changed)} products changed, {categories} categories recounted, {ranked} sales ranks changed)'))
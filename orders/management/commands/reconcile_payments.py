@@ -0,0 +1,208 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from orders.gateway import get_razorpay_client
+from orders.models import Order, PaymentLog
+
+
+# When an order has several payment attempts, the strongest outcome wins
+PAYMENT_RANK = {
+    'captured': 3,
+    'refunded': 2,
+    'authorized': 1,
+    'failed': 0,
+    'created': 0,
+}
+
+
+def parse_when(value):
+    """Parse a YYYY-MM-DD date or ISO datetime into an aware datetime"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'Invalid date: {value}')
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = 'Reconcile order payment status with the payments recorded by Razorpay'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', required=True, help='Start of the window (YYYY-MM-DD or ISO datetime)')
+        parser.add_argument('--until', help='End of the window (defaults to now)')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent gateway requests')
+        parser.add_argument('--slice-hours', type=int, default=24, help='Width of the time slice paged by each worker')
+        parser.add_argument('--page-size', type=int, default=100, help='Payments per gateway page (max 100)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Orders per lookup and bulk update')
+        parser.add_argument('--dry-run', action='store_true', help='Report fixes without writing them')
+
+    def handle(self, *args, **options):
+        since = parse_when(options['since'])
+        until = parse_when(options['until']) if options['until'] else timezone.now()
+        if since >= until:
+            raise CommandError('--since must be earlier than --until')
+
+        self.page_size = max(1, min(options['page_size'], 100))
+        self.local = threading.local()
+
+        started = timezone.now()
+        payments = self.fetch_payments(since, until, options['workers'], options['slice_hours'])
+        self.stdout.write(f'Fetched {len(payments)} payments from the gateway')
+
+        best = self.best_payment_per_order(payments)
+        fixed, unmatched = self.apply_fixes(best, options['batch_size'], options['dry_run'])
+
+        elapsed = (timezone.now() - started).total_seconds()
+        verb = 'Would repair' if options['dry_run'] else 'Repaired'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{verb} {fixed} orders; {unmatched} gateway orders had no local match '
+                f'({elapsed:.1f}s)'
+            )
+        )
+
+    def get_client(self):
+        # requests sessions are not thread-safe, so each worker keeps its own client
+        if not hasattr(self.local, 'client'):
+            self.local.client = get_razorpay_client()
+        return self.local.client
+
+    def fetch_slice(self, start, end):
+        """Page through every payment created within [start, end)"""
+        client = self.get_client()
+        items = []
+        skip = 0
+        while True:
+            page = client.payment.all({
+                'from': int(start.timestamp()),
+                'to': int(end.timestamp()) - 1,
+                'count': self.page_size,
+                'skip': skip,
+            })
+            batch = page.get('items', [])
+            items.extend(batch)
+            if len(batch) < self.page_size:
+                return items
+            skip += len(batch)
+
+    def fetch_payments(self, since, until, workers, slice_hours):
+        step = timedelta(hours=max(1, slice_hours))
+        slices = []
+        start = since
+        while start < until:
+            end = min(start + step, until)
+            slices.append((start, end))
+            start = end
+
+        payments = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(self.fetch_slice, start, end) for start, end in slices]
+            for future in as_completed(futures):
+                payments.extend(future.result())
+        return payments
+
+    def best_payment_per_order(self, payments):
+        best = {}
+        for payment in payments:
+            order_id = payment.get('order_id')
+            if not order_id:
+                continue
+            current = best.get(order_id)
+            rank = PAYMENT_RANK.get(payment.get('status'), 0)
+            if current is None or rank > PAYMENT_RANK.get(current.get('status'), 0):
+                best[order_id] = payment
+        return best
+
+    def repair(self, order, payment):
+        """Bring an order in line with its gateway payment. Returns True if it changed."""
+        gateway_status = payment.get('status')
+        payment_status, status = order.payment_status, order.status
+
+        if gateway_status == 'captured':
+            payment_status = 'completed'
+            if status in ('pending', 'failed'):
+                status = 'processing'
+        elif gateway_status == 'refunded':
+            payment_status = 'refunded'
+            status = 'refunded'
+        elif gateway_status == 'failed' and order.payment_status == 'pending':
+            payment_status = 'failed'
+            if status == 'pending':
+                status = 'failed'
+
+        payment_id = order.razorpay_payment_id
+        if gateway_status in ('captured', 'refunded'):
+            payment_id = payment['id']
+
+        if (payment_status, status, payment_id) == (order.payment_status, order.status, order.razorpay_payment_id):
+            return False
+
+        order.payment_status = payment_status
+        order.status = status
+        order.razorpay_payment_id = payment_id
+        return True
+
+    def apply_fixes(self, best, batch_size, dry_run):
+        gateway_order_ids = list(best)
+        fixed = 0
+        matched = 0
+        now = timezone.now()
+
+        for offset in range(0, len(gateway_order_ids), batch_size):
+            chunk = gateway_order_ids[offset:offset + batch_size]
+            orders = Order.objects.filter(razorpay_order_id__in=chunk).only(
+                'id', 'order_id', 'razorpay_order_id', 'razorpay_payment_id',
+                'payment_status', 'status', 'total_amount', 'sales_counted',
+            )
+
+            changed = []
+            logs = []
+            for order in orders:
+                matched += 1
+                payment = best[order.razorpay_order_id]
+                previous = order.payment_status
+                if not self.repair(order, payment):
+                    continue
+                order.updated_at = now
+                changed.append(order)
+                self.stdout.write(
+                    f'Order {order.order_id}: {previous} -> {order.payment_status} '
+                    f'(gateway {payment.get("status")})'
+                )
+                if order.payment_status == 'completed':
+                    logs.append(PaymentLog(
+                        order=order,
+                        razorpay_payment_id=payment['id'],
+                        razorpay_order_id=order.razorpay_order_id,
+                        amount=Decimal(payment.get('amount', 0)) / 100,
+                        status=payment.get('status', ''),
+                        method=payment.get('method') or '',
+                        response_data=payment,
+                    ))
+
+            fixed += len(changed)
+            if changed and not dry_run:
+                with transaction.atomic():
+                    Order.objects.bulk_update(
+                        changed,
+                        ['payment_status', 'status', 'razorpay_payment_id', 'updated_at'],
+                    )
+                    PaymentLog.objects.bulk_create(logs)
+                    for order in changed:
+                        if order.payment_status == 'completed':
+                            order.record_sales()
+                        elif order.payment_status == 'refunded':
+                            order.reverse_sales()
+
+        return fixed, len(gateway_order_ids) - matched
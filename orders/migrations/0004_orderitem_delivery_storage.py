@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:55
+
+from django.db import migrations, models
+import orders.downloads
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_gateway_id_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderitem',
+            name='delivery_file',
+            field=models.FileField(blank=True, null=True, storage=orders.downloads.delivery_storage, upload_to='orders/deliveries/'),
+        ),
+    ]
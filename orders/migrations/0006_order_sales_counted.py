@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_downloadlog_downloaded_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='sales_counted',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
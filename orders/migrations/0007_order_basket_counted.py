@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_sales_counted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='basket_counted',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
-from projects.models import Project
+from projects.models import Category, Project
+from .downloads import delivery_storage
 import uuid
 from django.utils import timezone
 
@@ -75,6 +78,12 @@ class Order(models.Model):
     notes = models.TextField(blank=True)
     admin_notes = models.TextField(blank=True, help_text="Internal notes for admin")
     
+    # Whether this order's items are included in Project.units_sold/revenue
+    sales_counted = models.BooleanField(default=False, editable=False)
+    # Whether this order's basket is included in the co-purchase counts
+    # (projects.CoPurchase, built by `manage.py build_cross_sells`)
+    basket_counted = models.BooleanField(default=False, editable=False)
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -82,15 +91,62 @@ class Order(models.Model):
             models.Index(fields=['status', '-created_at']),
             models.Index(fields=['payment_status']),
         ]
+        constraints = [
+            # Gateway identifiers are looked up on every payment callback;
+            # partial so the many unpaid orders without one don't collide
+            models.UniqueConstraint(
+                fields=['razorpay_order_id'],
+                condition=Q(razorpay_order_id__isnull=False),
+                name='unique_order_razorpay_order_id',
+            ),
+            models.UniqueConstraint(
+                fields=['razorpay_payment_id'],
+                condition=Q(razorpay_payment_id__isnull=False),
+                name='unique_order_razorpay_payment_id',
+            ),
+        ]
     
+    # Only ever flipped by conditional UPDATEs, so a full save of an instance
+    # loaded before the flip must not write the stale value back
+    COUNTED_FLAGS = ('sales_counted', 'basket_counted')
+
     def save(self, *args, **kwargs):
         if self.status == 'completed' and not self.completed_at:
             self.completed_at = timezone.now()
+        if not self._state.adding and not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTED_FLAGS
+            ]
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"Order {self.order_id} - {self.user.username}"
     
+    def record_sales(self):
+        """Add this paid order's items to the product sales counters, exactly once"""
+        return self._count_sales(counted=True)
+    
+    def reverse_sales(self):
+        """Take a refunded order's items back out of the product sales counters"""
+        return self._count_sales(counted=False)
+    
+    def _count_sales(self, counted):
+        with transaction.atomic():
+            # Flipping the flag conditionally makes a repeated callback a no-op
+            claimed = Order.objects.filter(pk=self.pk, sales_counted=not counted).update(sales_counted=counted)
+            if not claimed:
+                return False
+            sign = 1 if counted else -1
+            for item in self.items.annotate(category_id=F('project__category_id')):
+                Project.objects.filter(pk=item.project_id).update(
+                    units_sold=Greatest(F('units_sold') + sign * item.quantity, Value(0)),
+                    revenue=F('revenue') + sign * item.get_total_price(),
+                )
+                Category.adjust_counters(item.category_id, units=sign * item.quantity)
+        self.sales_counted = counted
+        return True
+    
     def get_total_items(self):
         return sum(item.quantity for item in self.items.all())
     
@@ -153,7 +209,7 @@ class OrderItem(models.Model):
     # Delivery details
     delivery_status = models.CharField(max_length=20, choices=DELIVERY_STATUS_CHOICES, default='pending')
     delivery_url = models.URLField(blank=True, help_text="Download link for customer")
-    delivery_file = models.FileField(upload_to='orders/deliveries/', blank=True, null=True)
+    delivery_file = models.FileField(upload_to='orders/deliveries/', storage=delivery_storage, blank=True, null=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
     
     # Access control
@@ -170,15 +226,36 @@ class OrderItem(models.Model):
     def get_total_price(self):
         return self.project_price * self.quantity
     
-    def can_download(self):
+    def can_download(self, resuming=False):
         if self.delivery_status != 'delivered':
             return False
-        if self.download_count >= self.max_downloads:
+        # Resuming a download claimed moments ago (orders.downloads.resume_granted)
+        # doesn't use up another one
+        if not resuming and self.download_count >= self.max_downloads:
             return False
         if self.access_expires_at and timezone.now() > self.access_expires_at:
             return False
         return True
     
+    def claim_download(self):
+        """
+        Atomically use up one download if the item is still downloadable.
+        
+        The checks from can_download() are part of the UPDATE itself, so two
+        concurrent downloads can't both take the last slot.
+        """
+        now = timezone.now()
+        claimed = OrderItem.objects.filter(
+            pk=self.pk,
+            delivery_status='delivered',
+            download_count__lt=F('max_downloads'),
+        ).filter(
+            Q(access_expires_at__isnull=True) | Q(access_expires_at__gt=now)
+        ).update(download_count=F('download_count') + 1, updated_at=now)
+        if claimed:
+            self.download_count += 1
+        return bool(claimed)
+    
     def __str__(self):
         return f"{self.project_title} x {self.quantity} - Order {self.order.order_id}"
 
@@ -195,6 +272,10 @@ class PaymentLog(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['razorpay_payment_id']),
+            models.Index(fields=['razorpay_order_id']),
+        ]
     
     def __str__(self):
         return f"Payment {self.razorpay_payment_id} - {self.status}"
@@ -205,7 +286,8 @@ class DownloadLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField(blank=True)
-    downloaded_at = models.DateTimeField(auto_now_add=True)
+    # Set when the download happens, not when the buffered row is written
+    downloaded_at = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         ordering = ['-downloaded_at']
@@ -1,3 +1,362 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from storages.backends.s3 import S3Storage
+
+from projects.models import CatalogEntry, Category, Project
+from .buffers import BatchedWriter
+from .downloads import presigned_download_url
+from .models import DownloadLog, Order, OrderItem, PaymentLog
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, DOWNLOAD_OFFLOAD='', DELIVERY_STORAGE_BUCKET='')
+@mock.patch('orders.views.download_logs')
+class DownloadFileTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('buyer', password='secret')
+        category = Category.objects.create(name='IoT')
+        project = Project.objects.create(
+            title='Weather Station', description='Kit', price=500, category=category, tags='iot', created_by=self.user,
+        )
+        order = Order.objects.create(
+            user=self.user, total_amount=500, customer_name='Buyer', customer_email='buyer@example.com',
+        )
+        self.item = OrderItem.objects.create(
+            order=order, project=project, project_title=project.title, project_price=500,
+            delivery_status='delivered', max_downloads=2,
+        )
+        self.item.delivery_file.save('kit.zip', ContentFile(b'0123456789'))
+        self.url = reverse('download_file', args=[self.item.pk])
+        self.client.force_login(self.user)
+
+    def download_count(self):
+        self.item.refresh_from_db()
+        return self.item.download_count
+
+    def test_full_downloads_stop_at_the_limit(self, download_logs):
+        for _ in range(2):
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.download_count(), 2)
+        self.assertEqual(download_logs.add.call_count, 2)
+
+    def test_resuming_a_claimed_download_is_free(self, download_logs):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-3')
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=4-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'456789')
+        self.assertEqual(self.download_count(), 1)
+        self.assertEqual(download_logs.add.call_count, 1)
+
+    def test_range_without_a_claimed_download_counts(self, download_logs):
+        # bytes=0-0 then bytes=1- must not fetch the file for free once downloads run out
+        self.item.download_count = 2
+        self.item.save()
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1-')
+        self.assertEqual(response.status_code, 302)
+
+        self.item.download_count = 1
+        self.item.save()
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.download_count(), 2)
+
+    def test_resume_is_tied_to_the_claiming_client(self, download_logs):
+        self.client.get(self.url, HTTP_RANGE='bytes=0-0', REMOTE_ADDR='10.0.0.1')
+        self.client.get(self.url, HTTP_RANGE='bytes=1-', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(self.download_count(), 2)
+
+    def test_not_modified_uses_no_download(self, download_logs):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.download_count(), 1)
+        self.assertEqual(download_logs.add.call_count, 1)
+
+    def test_unsatisfiable_range_uses_no_download(self, download_logs):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=50-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(self.download_count(), 0)
+
+
+class StubGateway:
+    """Stands in for the Razorpay client: pages through `payments` by creation time"""
+
+    def __init__(self, payments):
+        self.payments = payments
+        self.payment = self
+
+    def all(self, params):
+        matching = [p for p in self.payments if params['from'] <= p['created_at'] <= params['to']]
+        return {'items': matching[params['skip']:params['skip'] + params['count']]}
+
+
+def created_at(day, hour):
+    return int(datetime(2026, 1, day, hour, tzinfo=dt_timezone.utc).timestamp())
+
+
+class ReconcilePaymentsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer')
+        category = Category.objects.create(name='IoT')
+        self.project = Project.objects.create(
+            title='Weather Station', description='Kit', price=500, category=category, tags='iot', created_by=self.user,
+        )
+        self.unpaid = self.new_order('order_unpaid')
+        self.settled = self.new_order('order_settled', payment_status='completed', status='processing',
+                                      razorpay_payment_id='pay_settled')
+        self.refunded = self.new_order('order_refunded', payment_status='completed', status='completed',
+                                       razorpay_payment_id='pay_refunded')
+        self.gateway = StubGateway([
+            {'id': 'pay_failed', 'order_id': 'order_unpaid', 'status': 'failed', 'created_at': created_at(1, 9)},
+            {'id': 'pay_retry', 'order_id': 'order_unpaid', 'status': 'captured', 'amount': 50000,
+             'method': 'upi', 'created_at': created_at(2, 10)},
+            {'id': 'pay_settled', 'order_id': 'order_settled', 'status': 'captured', 'created_at': created_at(1, 11)},
+            {'id': 'pay_refunded', 'order_id': 'order_refunded', 'status': 'refunded', 'created_at': created_at(1, 12)},
+            {'id': 'pay_other', 'order_id': 'order_elsewhere', 'status': 'captured', 'created_at': created_at(2, 13)},
+            {'id': 'pay_late', 'order_id': 'order_settled', 'status': 'refunded', 'created_at': created_at(5, 9)},
+        ])
+
+    def new_order(self, razorpay_order_id, **fields):
+        order = Order.objects.create(
+            user=self.user, total_amount=500, customer_name='Buyer', customer_email='buyer@example.com',
+            razorpay_order_id=razorpay_order_id, **fields,
+        )
+        OrderItem.objects.create(order=order, project=self.project, project_title=self.project.title,
+                                 project_price=500)
+        return order
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        with mock.patch('orders.management.commands.reconcile_payments.get_razorpay_client',
+                        return_value=self.gateway):
+            call_command('reconcile_payments', '--since', '2026-01-01', '--until', '2026-01-03',
+                         '--page-size', '1', *args, stdout=out)
+        for order in (self.unpaid, self.settled, self.refunded):
+            order.refresh_from_db()
+        return out.getvalue()
+
+    def test_repairs_orders_from_their_strongest_payment(self):
+        output = self.reconcile()
+        self.assertIn('Fetched 5 payments', output)
+        self.assertIn('Repaired 2 orders; 1 gateway orders had no local match', output)
+
+        self.assertEqual((self.unpaid.payment_status, self.unpaid.status), ('completed', 'processing'))
+        self.assertEqual(self.unpaid.razorpay_payment_id, 'pay_retry')
+        log = PaymentLog.objects.get()
+        self.assertEqual((log.order, log.amount, log.method), (self.unpaid, 500, 'upi'))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.units_sold, 1)
+
+        # Payments outside the window are never fetched
+        self.assertEqual((self.settled.payment_status, self.settled.status), ('completed', 'processing'))
+        self.assertEqual((self.refunded.payment_status, self.refunded.status), ('refunded', 'refunded'))
+
+        self.assertIn('Repaired 0 orders', self.reconcile())
+
+    def test_dry_run_writes_nothing(self):
+        output = self.reconcile('--dry-run')
+        self.assertIn('Would repair 2 orders', output)
+        self.assertEqual(self.unpaid.payment_status, 'pending')
+        self.assertEqual(self.refunded.payment_status, 'completed')
+        self.assertFalse(PaymentLog.objects.exists())
+
+
+@override_settings(DELIVERY_URL_EXPIRY=300)
+class PresignedDownloadUrlTests(TestCase):
+    def setUp(self):
+        storage = S3Storage(bucket_name='deliveries', access_key='key', secret_key='secret')
+        signed = iter(f'https://deliveries.example.com/kit.zip?signature={n}' for n in range(1, 10))
+        self.sign = mock.patch.object(storage, 'url', side_effect=lambda *args, **kwargs: next(signed)).start()
+        self.addCleanup(mock.patch.stopall)
+        self.field_file = mock.Mock(storage=storage)
+        self.field_file.name = 'deliveries/kit.zip'
+        # A private cache on a controllable clock
+        mock.patch('orders.downloads.cache', LocMemCache('presign-tests', {})).start()
+        self.clock = 1_000_000.0
+        for module in ('base', 'locmem'):
+            mock.patch(f'django.core.cache.backends.{module}.time', time=lambda: self.clock).start()
+
+    def test_url_is_signed_once_and_reused(self):
+        first = presigned_download_url(self.field_file, 'Weather Station.zip')
+        self.assertEqual(presigned_download_url(self.field_file, 'Weather Station.zip'), first)
+        self.sign.assert_called_once()
+        kwargs = self.sign.call_args.kwargs
+        self.assertEqual(kwargs['expire'], 300)
+        self.assertEqual(kwargs['parameters']['ResponseContentDisposition'], 'attachment; filename="Weather Station.zip"')
+
+        # Another download name gets its own URL
+        self.assertNotEqual(presigned_download_url(self.field_file, 'kit.zip'), first)
+
+    def test_url_is_resigned_before_it_expires(self):
+        first = presigned_download_url(self.field_file, 'kit.zip')
+        self.clock += 239
+        self.assertEqual(presigned_download_url(self.field_file, 'kit.zip'), first)
+        self.clock += 2
+        self.assertNotEqual(presigned_download_url(self.field_file, 'kit.zip'), first)
+        self.assertEqual(self.sign.call_count, 2)
+
+    def test_other_storage_is_not_signed(self):
+        self.field_file.storage = mock.Mock()
+        self.assertIsNone(presigned_download_url(self.field_file, 'kit.zip'))
+
+
+# No writer thread, and the test's connection stays open: flush() is run here instead
+@mock.patch('orders.buffers.close_old_connections')
+@mock.patch('orders.buffers.threading.Thread')
+class BatchedWriterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer')
+        category = Category.objects.create(name='IoT')
+        project = Project.objects.create(
+            title='Weather Station', description='Kit', price=500, category=category, tags='iot', created_by=self.user,
+        )
+        order = Order.objects.create(
+            user=self.user, total_amount=500, customer_name='Buyer', customer_email='buyer@example.com',
+        )
+        self.item = OrderItem.objects.create(order=order, project=project, project_title=project.title,
+                                             project_price=500)
+
+    def log(self, ip):
+        return DownloadLog(order_item=self.item, user=self.user, ip_address=ip)
+
+    def test_full_batch_wakes_the_writer(self, thread, close_old_connections):
+        writer = BatchedWriter(DownloadLog, batch_size=2)
+        writer.add(self.log('10.0.0.1'))
+        self.assertFalse(writer._wakeup.is_set())
+        self.assertFalse(DownloadLog.objects.exists())
+        writer.add(self.log('10.0.0.2'))
+        self.assertTrue(writer._wakeup.is_set())
+        # Started once, lazily
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+        writer.flush()
+        self.assertEqual(sorted(DownloadLog.objects.values_list('ip_address', flat=True)), ['10.0.0.1', '10.0.0.2'])
+        writer.flush()
+        self.assertEqual(DownloadLog.objects.count(), 2)
+
+    def test_ring_drops_the_oldest_rows(self, thread, close_old_connections):
+        writer = BatchedWriter(DownloadLog, max_pending=2)
+        for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            writer.add(self.log(ip))
+        with self.assertLogs('orders.buffers', 'WARNING') as logs:
+            writer.flush()
+        self.assertIn('dropped the 1 oldest DownloadLog rows', logs.output[0])
+        self.assertEqual(sorted(DownloadLog.objects.values_list('ip_address', flat=True)), ['10.0.0.2', '10.0.0.3'])
+
+    def test_failed_write_is_logged_not_raised(self, thread, close_old_connections):
+        writer = BatchedWriter(DownloadLog)
+        writer.add(self.log('10.0.0.1'))
+        with mock.patch.object(DownloadLog.objects, 'bulk_create', side_effect=DatabaseError('disk full')), \
+                self.assertLogs('orders.buffers', 'ERROR') as logs:
+            writer.flush()
+        self.assertIn('Dropped 1 buffered DownloadLog rows', logs.output[0])
+        writer.flush()
+        self.assertFalse(DownloadLog.objects.exists())
+
+
+class SalesCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer')
+        self.iot = Category.objects.create(name='IoT')
+        self.station = self.new_project('Weather Station', 500)
+        self.plug = self.new_project('Smart Plug', 300)
+        self.order = self.new_order((self.station, 2), (self.plug, 1))
+
+    def new_project(self, title, price):
+        return Project.objects.create(title=title, description='Kit', price=price, category=self.iot, tags='iot',
+                                      created_by=self.user)
+
+    def new_order(self, *lines, **fields):
+        order = Order.objects.create(user=self.user, total_amount=0, customer_name='Buyer',
+                                     customer_email='buyer@example.com', **fields)
+        for project, quantity in lines:
+            OrderItem.objects.create(order=order, project=project, project_title=project.title,
+                                     project_price=project.price, quantity=quantity)
+        return order
+
+    def counters(self):
+        self.station.refresh_from_db()
+        self.plug.refresh_from_db()
+        self.iot.refresh_from_db()
+        return (self.station.units_sold, self.station.revenue, self.plug.units_sold, self.plug.revenue,
+                self.iot.units_sold)
+
+    def test_record_sales_counts_once(self):
+        self.assertTrue(self.order.record_sales())
+        self.assertFalse(Order.objects.get(pk=self.order.pk).record_sales())
+        self.assertEqual(self.counters(), (2, 1000, 1, 300, 3))
+
+    def test_reverse_sales_undoes_a_recorded_order_once(self):
+        self.order.record_sales()
+        self.assertTrue(self.order.reverse_sales())
+        self.assertFalse(self.order.reverse_sales())
+        self.assertEqual(self.counters(), (0, 0, 0, 0, 0))
+
+    def test_saving_a_stale_order_keeps_the_counted_flag(self):
+        stale = Order.objects.get(pk=self.order.pk)
+        self.order.record_sales()
+        stale.payment_status = 'refunded'
+        stale.save()
+        self.assertTrue(stale.reverse_sales())
+        self.assertEqual(self.counters(), (0, 0, 0, 0, 0))
+
+    def test_reverse_sales_without_record_changes_nothing(self):
+        self.assertFalse(self.order.reverse_sales())
+        self.assertEqual(self.counters(), (0, 0, 0, 0, 0))
+
+    def test_active_project_count_follows_saves(self):
+        self.iot.refresh_from_db()
+        self.assertEqual(self.iot.active_project_count, 2)
+        robotics = Category.objects.create(name='Robotics')
+        self.plug.category = robotics
+        self.plug.save()
+        self.station.is_active = False
+        self.station.save()
+        self.iot.refresh_from_db()
+        robotics.refresh_from_db()
+        self.assertEqual((self.iot.active_project_count, robotics.active_project_count), (0, 1))
+
+    def test_rebuild_recomputes_from_paid_orders(self):
+        self.order.payment_status = 'completed'
+        self.order.save()
+        refunded = self.new_order((self.plug, 5), payment_status='refunded', sales_counted=True)
+        # Counters drifted by writes that skipped record_sales()
+        Project.objects.filter(pk=self.plug.pk).update(units_sold=40, revenue=1)
+        Category.objects.filter(pk=self.iot.pk).update(units_sold=7, active_project_count=9)
+
+        out = io.StringIO()
+        call_command('rebuild_sales_counters', stdout=out)
+        self.assertIn('2 products changed', out.getvalue())
+        self.assertEqual(self.counters(), (2, 1000, 1, 300, 3))
+        self.assertEqual(self.iot.active_project_count, 2)
+        self.assertTrue(Order.objects.get(pk=self.order.pk).sales_counted)
+        self.assertFalse(Order.objects.get(pk=refunded.pk).sales_counted)
+        self.assertEqual(dict(CatalogEntry.objects.values_list('pk', 'sales_rank')),
+                         {self.station.pk: 1, self.plug.pk: 2})
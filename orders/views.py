@@ -3,7 +3,7 @@ from django.views.generic import TemplateView, ListView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse, Http404
+from django.http import JsonResponse, Http404
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.conf import settings
@@ -12,7 +12,9 @@ from django.urls import reverse
 from projects.models import Cart, CartItem
 from .models import Order, OrderItem, PaymentLog, DownloadLog
 from .forms import AddressForm
-import razorpay
+from .gateway import get_razorpay_client
+from .buffers import download_logs
+from .downloads import grant_resume, presigned_download_url, resume_granted, serve_file
 import json
 import uuid
 
@@ -115,7 +117,7 @@ def create_razorpay_order(request):
             return JsonResponse({'error': 'Delivery information is required'}, status=400)
         
         # Create Razorpay client
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+        client = get_razorpay_client()
         
         # Calculate total amount
         total_amount = cart.get_total_price()
@@ -201,7 +203,7 @@ def payment_callback(request):
                 return redirect('payment_failed')
             
             # Verify payment signature
-            client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+            client = get_razorpay_client()
             
             params_dict = {
                 'razorpay_order_id': order_id,
@@ -238,6 +240,7 @@ def payment_callback(request):
             order.payment_status = 'completed'
             order.status = 'processing'
             order.save()
+            order.record_sales()
             print(f"Order {order.order_id} updated successfully")
             
             # Log payment
@@ -359,33 +362,42 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
 
 @login_required
 def download_file(request, item_id):
-    order_item = get_object_or_404(OrderItem, id=item_id, order__user=request.user)
+    order_item = get_object_or_404(OrderItem.objects.select_related('order'), id=item_id, order__user=request.user)
     
-    # Check if user can download
-    if not order_item.can_download():
+    def claim():
+        # Continuing a download claimed moments ago doesn't count as a new one
+        if resume_granted(order_item, request):
+            return order_item.can_download(resuming=True)
+        # New downloads claim a slot in a single UPDATE
+        if not order_item.claim_download():
+            return False
+        grant_resume(order_item, request)
+        # Log the download; rows are written in batches in the background
+        download_logs.add(DownloadLog(
+            order_item=order_item,
+            user=request.user,
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT', '')
+        ))
+        return True
+    
+    def refuse():
         messages.error(request, 'Download not available or limit exceeded.')
         return redirect('order_detail', order_id=order_item.order.order_id)
     
-    # Log the download
-    DownloadLog.objects.create(
-        order_item=order_item,
-        user=request.user,
-        ip_address=request.META.get('REMOTE_ADDR'),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')
-    )
-    
-    # Increment download count
-    order_item.download_count += 1
-    order_item.save()
-    
     # Return file or redirect to download URL
     if order_item.delivery_file:
-        # Serve file download
-        response = HttpResponse(order_item.delivery_file.read(), content_type='application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="{order_item.project_title}.zip"'
-        return response
+        filename = f'{order_item.project_title}.zip'
+        # Object storage serves the bytes itself via a short-lived signed URL
+        signed_url = presigned_download_url(order_item.delivery_file, filename)
+        if signed_url:
+            return redirect(signed_url) if claim() else refuse()
+        # Stream the file (or hand it to the web server) instead of reading it into memory;
+        # the download is only claimed once a body is actually sent
+        response = serve_file(request, order_item.delivery_file, filename, claim=claim)
+        return refuse() if response is None else response
     elif order_item.delivery_url:
-        return redirect(order_item.delivery_url)
+        return redirect(order_item.delivery_url) if claim() else refuse()
     else:
         messages.error(request, 'Download file not available.')
         return redirect('order_detail', order_id=order_item.order.order_id)
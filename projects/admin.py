@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Project, ProjectImage, Cart, CartItem
+from .models import Category, Project, ProjectImage, ImageAsset, ExternalImage, ImageJob, Cart, CartItem
 
 
 @admin.register(Category)
@@ -24,8 +24,8 @@ class ProjectImageInline(admin.TabularInline):
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
-    list_display = ['title', 'category', 'price', 'is_active', 'created_by', 'created_at']
-    list_filter = ['category', 'is_active', 'delivery_type', 'created_at']
+    list_display = ['title', 'category', 'price', 'is_active', 'image_status', 'created_by', 'created_at']
+    list_filter = ['category', 'is_active', 'delivery_type', 'image_status', 'created_at']
     search_fields = ['title', 'description', 'tags']
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ['created_at', 'updated_at']
@@ -67,6 +67,36 @@ class ProjectImageAdmin(admin.ModelAdmin):
     search_fields = ['project__title', 'alt_text']
 
 
+@admin.register(ImageAsset)
+class ImageAssetAdmin(admin.ModelAdmin):
+    list_display = ['file', 'ref_count', 'status', 'created_at']
+    list_filter = ['status']
+    search_fields = ['digest', 'file']
+    readonly_fields = ['digest', 'file', 'ref_count', 'derivatives', 'created_at', 'updated_at']
+
+
+@admin.register(ExternalImage)
+class ExternalImageAdmin(admin.ModelAdmin):
+    list_display = ['source_url', 'image_status', 'fetched_at', 'created_at']
+    list_filter = ['image_status']
+    search_fields = ['source_url']
+    readonly_fields = ['url_hash', 'source_url', 'file', 'fetched_at', 'created_at']
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'content_type', 'object_id', 'field_name', 'status', 'attempts', 'updated_at']
+    list_filter = ['status', 'content_type']
+    readonly_fields = ['content_type', 'object_id', 'field_name', 'attempts', 'error', 'created_at', 'updated_at']
+    
+    actions = ['retry_jobs']
+    
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status='processing').update(status='pending', attempts=0)
+        self.message_user(request, f'{updated} jobs queued for retry.')
+    retry_jobs.short_description = "Retry selected jobs"
+
+
 class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
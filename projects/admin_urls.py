@@ -8,6 +8,7 @@ urlpatterns = [
     path('', admin_views.AdminDashboardView.as_view(), name='dashboard'),
     path('analytics/', admin_views.admin_analytics, name='analytics'),
     path('api/analytics/', admin_views.analytics_api, name='analytics_api'),
+    path('search-report/', admin_views.search_report, name='search_report'),
     
     # Orders
     path('orders/', admin_views.AdminOrderListView.as_view(), name='order_list'),
@@ -16,6 +17,7 @@ urlpatterns = [
     
     # Products
     path('products/', admin_views.AdminProductListView.as_view(), name='product_list'),
+    path('products/bulk/', admin_views.bulk_product_action, name='bulk_product_action'),
     path('products/create/', admin_views.AdminProductCreateView.as_view(), name='product_create'),
     path('products/<int:pk>/edit/', admin_views.AdminProductUpdateView.as_view(), name='product_edit'),
     path('products/<int:product_id>/toggle/', admin_views.toggle_product_status, name='toggle_product_status'),
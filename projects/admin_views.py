@@ -6,10 +6,16 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_POST
-from django.db.models import Q, Count, Sum, Avg
+from django.db import transaction
+from django.db.models import Q, Sum, Avg, F, DecimalField, Exists, Max, OuterRef, Value
+from django.db.models.functions import Greatest, Round
 from django.utils import timezone
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlencode
 from .models import Project, Category, ProjectImage
+from .search_analytics import search_report as build_search_report
+from .signals import products_changed
 from orders.models import Order, OrderItem
 from .admin_forms import ProjectCreateForm, ProjectUpdateForm, CategoryForm, ProjectImageFormSet
 from django.contrib.auth.models import User
@@ -68,10 +74,8 @@ class AdminDashboardView(AdminRequiredMixin, TemplateView):
         # Recent orders
         recent_orders = Order.objects.select_related('user').order_by('-created_at')[:10]
         
-        # Top selling products
-        top_products = Project.objects.annotate(
-            order_count=Count('orderitem')
-        ).filter(order_count__gt=0).order_by('-order_count')[:5]
+        # Top selling products, read in index order from the maintained counters
+        top_products = Project.objects.filter(units_sold__gt=0).order_by('-units_sold')[:5]
         
         context.update({
             'total_orders': total_orders,
@@ -189,6 +193,32 @@ def update_order_status(request, order_id):
     return redirect('admin_panel:order_detail', order_id=order_id)
 
 
+def filter_products(queryset, params):
+    """Apply the product list's category/status/search filters"""
+    # Filter by category
+    category = params.get('category')
+    if category and category != 'all':
+        queryset = queryset.filter(category_id=category)
+    
+    # Filter by status
+    status = params.get('status')
+    if status == 'active':
+        queryset = queryset.filter(is_active=True)
+    elif status == 'inactive':
+        queryset = queryset.filter(is_active=False)
+    
+    # Search
+    search = params.get('search')
+    if search:
+        queryset = queryset.filter(
+            Q(title__icontains=search) |
+            Q(description__icontains=search) |
+            Q(tags__icontains=search)
+        )
+    
+    return queryset
+
+
 class AdminProductListView(AdminRequiredMixin, ListView):
     model = Project
     template_name = 'admin/products/product_list.html'
@@ -197,29 +227,7 @@ class AdminProductListView(AdminRequiredMixin, ListView):
     
     def get_queryset(self):
         queryset = Project.objects.select_related('category', 'created_by').order_by('-created_at')
-        
-        # Filter by category
-        category = self.request.GET.get('category')
-        if category and category != 'all':
-            queryset = queryset.filter(category_id=category)
-        
-        # Filter by status
-        status = self.request.GET.get('status')
-        if status == 'active':
-            queryset = queryset.filter(is_active=True)
-        elif status == 'inactive':
-            queryset = queryset.filter(is_active=False)
-        
-        # Search
-        search = self.request.GET.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(tags__icontains=search)
-            )
-        
-        return queryset
+        return filter_products(queryset, self.request.GET)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -354,6 +362,102 @@ def delete_product(request, product_id):
     return redirect('admin_panel:product_list')
 
 
+# Products per UPDATE/DELETE statement in bulk actions
+BULK_CHUNK_SIZE = 500
+
+# Highest price Project.price can store (max_digits=10, decimal_places=2)
+MAX_PRICE = Decimal('99999999.99')
+
+BULK_ACTIONS = {
+    'activate': 'activated',
+    'deactivate': 'deactivated',
+    'reprice': 'repriced',
+    'delete': 'deleted',
+}
+
+
+def price_factor(amount):
+    return (Decimal(100) + amount) / Decimal(100)
+
+
+def new_price(mode, amount):
+    """Update expression for a bulk reprice: a fixed price or a percentage change"""
+    if mode == 'set':
+        return Value(amount)
+    factor = price_factor(amount)
+    price = Round(F('price') * Value(factor), 2, output_field=DecimalField(max_digits=10, decimal_places=2))
+    return Greatest(price, Value(Decimal('0.00')))
+
+
+@login_required
+@user_passes_test(admin_required)
+@require_POST
+def bulk_product_action(request):
+    """
+    Apply an action to the selected products, or to every product matching
+    the list's current filters, a chunk of rows per statement.
+    """
+    action = request.POST.get('action')
+    filters = {key: request.POST.get(key, '') for key in ('category', 'status', 'search')}
+    redirect_url = reverse('admin_panel:product_list')
+    if any(filters.values()):
+        redirect_url += '?' + urlencode(filters)
+    
+    if action not in BULK_ACTIONS:
+        messages.error(request, 'Choose a bulk action.')
+        return redirect(redirect_url)
+    
+    if request.POST.get('scope') == 'filter':
+        queryset = filter_products(Project.objects.all(), filters)
+    else:
+        try:
+            selected = [int(pk) for pk in request.POST.getlist('product_ids')]
+        except ValueError:
+            messages.error(request, 'Invalid product selection.')
+            return redirect(redirect_url)
+        queryset = Project.objects.filter(pk__in=selected)
+    product_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    if not product_ids:
+        messages.error(request, 'No products selected.')
+        return redirect(redirect_url)
+    
+    if action == 'reprice':
+        mode = request.POST.get('price_mode')
+        try:
+            amount = Decimal(request.POST.get('amount', ''))
+        except InvalidOperation:
+            amount = None
+        if (mode not in ('set', 'percent') or amount is None or not amount.is_finite()
+                or (mode == 'set' and amount < 0)):
+            messages.error(request, 'Enter a valid price or percentage.')
+            return redirect(redirect_url)
+        # Checked up front: a DataError partway through would leave earlier chunks repriced
+        if mode == 'set':
+            highest = amount
+        else:
+            highest = (queryset.aggregate(highest=Max('price'))['highest'] or 0) * price_factor(amount)
+        if highest > MAX_PRICE:
+            messages.error(request, f'Prices can be at most ₹{MAX_PRICE:,}.')
+            return redirect(redirect_url)
+        updates = {'price': new_price(mode, amount)}
+    elif action in ('activate', 'deactivate'):
+        updates = {'is_active': action == 'activate'}
+    
+    affected = 0
+    for start in range(0, len(product_ids), BULK_CHUNK_SIZE):
+        chunk = product_ids[start:start + BULK_CHUNK_SIZE]
+        with transaction.atomic():
+            if action == 'delete':
+                # delete() still sends post_delete per row so shared images are released
+                affected += Project.objects.filter(pk__in=chunk).delete()[1].get(Project._meta.label, 0)
+            else:
+                affected += Project.objects.filter(pk__in=chunk).update(updated_at=timezone.now(), **updates)
+        products_changed.send(sender=Project, product_ids=chunk, action=action)
+    
+    messages.success(request, f'{affected} products {BULK_ACTIONS[action]}.')
+    return redirect(redirect_url)
+
+
 @login_required
 @user_passes_test(admin_required)
 @require_POST
@@ -373,7 +477,10 @@ class AdminCategoryListView(AdminRequiredMixin, ListView):
     context_object_name = 'categories'
     
     def get_queryset(self):
-        return Category.objects.annotate(project_count=Count('projects'))
+        # Inactive products also block deletion, so the counters can't tell
+        return Category.objects.annotate(
+            has_products=Exists(Project.objects.filter(category=OuterRef('pk')))
+        )
 
 
 class AdminCategoryCreateView(AdminRequiredMixin, CreateView):
@@ -410,9 +517,9 @@ class AdminCategoryUpdateView(AdminRequiredMixin, UpdateView):
 def delete_category(request, category_id):
     category = get_object_or_404(Category, id=category_id)
     
-    # Check if category has products
-    if category.projects.count() > 0:
-        messages.error(request, f'Cannot delete category "{category.name}" because it has {category.projects.count()} products associated with it.')
+    # Check if category has products, inactive ones included
+    if category.projects.exists():
+        messages.error(request, f'Cannot delete category "{category.name}" because it has products associated with it.')
         return redirect('admin_panel:category_list')
     
     name = category.name
@@ -432,6 +539,19 @@ def admin_analytics(request):
     return render(request, 'admin/analytics.html', context)
 
 
+@login_required
+@user_passes_test(admin_required)
+def search_report(request):
+    """Top and zero-result searches, from the daily rollup"""
+    days = 30 if request.GET.get('days') == '30' else 7
+    context = {
+        'title': 'Search Report',
+        'days': days,
+        'report': build_search_report(days),
+    }
+    return render(request, 'admin/search_report.html', context)
+
+
 @login_required
 @user_passes_test(admin_required)
 def analytics_api(request):
@@ -462,10 +582,8 @@ def analytics_api(request):
             'detail_url': reverse('admin_panel:order_detail', kwargs={'order_id': order.order_id})
         })
     
-    # Top products (by order count)
-    top_products = Project.objects.annotate(
-        orders_count=Count('orderitem')
-    ).filter(orders_count__gt=0).order_by('-orders_count')[:5]
+    # Top products (by units sold on paid orders)
+    top_products = Project.objects.select_related('category').filter(units_sold__gt=0).order_by('-units_sold')[:5]
     
     top_products_data = []
     for product in top_products:
@@ -475,7 +593,8 @@ def analytics_api(request):
             'slug': product.slug,
             'category': product.category.name if product.category else 'Uncategorized',
             'price': float(product.price),
-            'orders_count': product.orders_count,
+            'units_sold': product.units_sold,
+            'revenue': float(product.revenue),
             'image_url': product.get_featured_image_url() if hasattr(product, 'get_featured_image_url') else None,
             'detail_url': reverse('project_detail', args=[product.slug]),
             'admin_edit_url': reverse('admin_panel:product_edit', kwargs={'pk': product.id})
@@ -505,14 +624,12 @@ def analytics_api(request):
     
     # Top selling categories
     category_data = []
-    categories = Category.objects.annotate(
-        order_count=Count('projects__orderitem')
-    ).filter(order_count__gt=0).order_by('-order_count')[:5]
+    categories = Category.objects.filter(units_sold__gt=0).order_by('-units_sold')[:5]
     
     for category in categories:
         category_data.append({
             'name': category.name,
-            'orders': category.order_count
+            'units_sold': category.units_sold
         })
     
     # Calculate additional metrics
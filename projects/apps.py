@@ -1,6 +1,30 @@
 from django.apps import AppConfig
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_migrate
+
+
+def fill_catalog_entries(sender, using, **kwargs):
+    """Build the public catalog snapshot the first time the table exists but is empty"""
+    # CatalogEntry.refresh() and rank() work on the default database only
+    if using != DEFAULT_DB_ALIAS:
+        return
+    from .models import CatalogEntry, Project
+    if not CatalogEntry.objects.exists() and Project.objects.filter(is_active=True).exists():
+        CatalogEntry.refresh()
+        CatalogEntry.rank()
+
+
+def create_cache_table(sender, using, **kwargs):
+    """Create the DatabaseCache table (settings.CACHES) with the schema, so every migrate leaves it in place"""
+    from django.core.management import call_command
+    call_command('createcachetable', database=using, verbosity=0)
 
 
 class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'projects'
+
+    def ready(self):
+        # After migrate rather than in a data migration, so it runs against the current models
+        post_migrate.connect(fill_catalog_entries, sender=self)
+        post_migrate.connect(create_cache_table, sender=self)
@@ -0,0 +1,132 @@
+"""
+Search suggestions served from memory.
+
+Each process keeps a sorted array of every word-start suffix of project
+titles, tag names and category names, and answers a prefix with two
+bisects over it, so typing in the search box never reaches the database.
+The array is rebuilt when the catalog version (projects.signals) changes,
+checked against the cache at most every VERSION_CHECK_INTERVAL seconds.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from urllib.parse import urlencode
+
+from django.urls import reverse
+
+from .models import Category, Project
+from .signals import catalog_version
+
+
+MAX_SUGGESTIONS = 8
+
+# Shorter prefixes match too much of the catalog to be useful
+MIN_PREFIX_LENGTH = 2
+
+# Above this many matching entries, search walks the weight order instead
+SCAN_LIMIT = 256
+
+# Seconds between checks of the shared catalog version
+VERSION_CHECK_INTERVAL = 5
+
+WORD_START = re.compile(r'\b\w')
+
+
+def normalize(text):
+    """Case- and accent-insensitive form used for matching"""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return ' '.join(''.join(c for c in text if not unicodedata.combining(c)).split())
+
+
+class PrefixIndex:
+    """Sorted (key, suggestion) pairs, where keys start at each word of a suggestion's label"""
+
+    def __init__(self, suggestions):
+        # suggestions: (label, kind, url, weight); heavier ones rank first
+        self.suggestions = []
+        entries = []
+        for label, kind, url, weight in suggestions:
+            position = len(self.suggestions)
+            self.suggestions.append({'label': label, 'type': kind, 'url': url})
+            text = normalize(label)
+            for match in WORD_START.finditer(text):
+                entries.append((text[match.start():], -weight, position))
+        entries.sort()
+        self.keys = [key for key, weight, position in entries]
+        self.ranks = [(weight, position) for key, weight, position in entries]
+        # Entry indexes heaviest first, for prefixes matching much of the catalog
+        self.by_weight = sorted(range(len(entries)), key=self.ranks.__getitem__)
+
+    def __len__(self):
+        return len(self.suggestions)
+
+    def search(self, prefix, limit=MAX_SUGGESTIONS):
+        prefix = normalize(prefix)
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            return []
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\U0010ffff', lo=start)
+        if end - start <= SCAN_LIMIT:
+            # A label can match at several of its words; keep each once
+            best = {}
+            for weight, position in self.ranks[start:end]:
+                best[position] = min(weight, best.get(position, 0))
+            top = [position for position, weight in heapq.nsmallest(limit, best.items(), key=lambda item: (item[1], item[0]))]
+        else:
+            # Broad prefix: walking entries by weight finds `limit` matches sooner
+            top = []
+            for i in self.by_weight:
+                if start <= i < end and self.ranks[i][1] not in top:
+                    top.append(self.ranks[i][1])
+                    if len(top) == limit:
+                        break
+        return [self.suggestions[position] for position in top]
+
+
+def catalog_suggestions():
+    """(label, kind, url, weight) for every active project, its categories and tags"""
+    tags = Counter()
+    labels = {}
+    products = Project.objects.filter(is_active=True).values_list('title', 'slug', 'tags', 'units_sold')
+    for title, slug, tag_list, units_sold in products.iterator(chunk_size=2000):
+        yield title, 'project', reverse('project_detail', args=[slug]), units_sold
+        for tag in {tag.strip() for tag in tag_list.split(',') if tag.strip()}:
+            # "IoT" and "iot" are one tag, shown as first spelled
+            tags[labels.setdefault(normalize(tag), tag)] += 1
+
+    search_url = reverse('search')
+    for tag, count in tags.items():
+        yield tag, 'tag', f'{search_url}?{urlencode({"q": tag})}', count
+
+    categories = Category.objects.filter(active_project_count__gt=0).values_list('name', 'slug', 'active_project_count')
+    for name, slug, count in categories:
+        yield name, 'category', reverse('category_projects', args=[slug]), count
+
+
+_lock = threading.Lock()
+_index = None
+_version = None
+_checked_at = 0.0
+
+
+def get_index():
+    """This process's index, rebuilt if the catalog has changed since it was built"""
+    global _index, _version, _checked_at
+    if _index is not None and time.monotonic() - _checked_at < VERSION_CHECK_INTERVAL:
+        return _index
+
+    version = catalog_version()
+    with _lock:
+        if _index is None or version != _version:
+            _index = PrefixIndex(catalog_suggestions())
+            _version = version
+        _checked_at = time.monotonic()
+    return _index
+
+
+def suggest(prefix, limit=MAX_SUGGESTIONS):
+    return get_index().search(prefix, limit)
@@ -0,0 +1,197 @@
+"""
+Bulk catalog import used by `manage.py import_catalog`.
+
+Rows are streamed from JSON, JSONL or CSV, validated, and written in chunks
+with one category upsert and one project upsert (keyed on slug) per chunk,
+instead of a get_or_create/create/save round trip per row.
+"""
+import csv
+import io
+import json
+import sys
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .fuzzy import index_projects
+from .models import CatalogEntry, Category, Project
+from .signals import bump_catalog_version
+
+
+FORMATS = ('json', 'jsonl', 'csv')
+
+DELIVERY_TYPES = {value for value, label in Project.DELIVERY_CHOICES}
+
+# Columns overwritten when an imported slug already exists; created_by and
+# created_at keep their original values. featured_image is left out because
+# bulk_create() skips save(), which counts references to uploads (ImageAsset)
+PROJECT_UPDATE_FIELDS = [
+    'title', 'description', 'price', 'category', 'tags',
+    'featured_image_url', 'resolved_image_url', 'demo_video_url', 'embed_video_url',
+    'download_url', 'delivery_type', 'is_active', 'meta_description', 'updated_at',
+]
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+
+# Digits a price may have before the decimal point, as Project.price stores it
+_price_field = Project._meta.get_field('price')
+PRICE_INTEGER_DIGITS = _price_field.max_digits - _price_field.decimal_places
+
+
+class RowError(ValueError):
+    pass
+
+
+def guess_format(path):
+    for fmt in FORMATS:
+        if path.lower().endswith(f'.{fmt}'):
+            return fmt
+    return None
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, dict) pairs from a text stream"""
+    if fmt == 'jsonl':
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as exc:
+                # Reported by clean_row like any other bad row
+                yield number, RowError(f'invalid JSON ({exc})')
+    elif fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        # Plain JSON has to be parsed whole; prefer JSONL for very large catalogs
+        data = json.load(stream)
+        if isinstance(data, dict):
+            data = data.get('projects', [])
+        for number, row in enumerate(data, 1):
+            yield number, row
+
+
+def clean_row(row):
+    """Validate one input row and return normalized values, raising RowError"""
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError('row is not an object')
+
+    def text(key, default=''):
+        value = row.get(key)
+        return default if value is None else str(value).strip()
+
+    title = text('title')
+    if not title:
+        raise RowError('title is required')
+    category = text('category')
+    if not category:
+        raise RowError('category is required')
+
+    try:
+        price = Decimal(text('price'))
+    except InvalidOperation:
+        raise RowError(f'invalid price {row.get("price")!r}')
+    # NaN and Infinity parse, but can't be compared or stored
+    if not price.is_finite() or price < 0 or price.as_tuple().exponent < -_price_field.decimal_places:
+        raise RowError(f'invalid price {row.get("price")!r}')
+    if price >= 10 ** PRICE_INTEGER_DIGITS:
+        raise RowError(f'price {row.get("price")!r} has more than {PRICE_INTEGER_DIGITS} digits before the point')
+
+    delivery_type = text('delivery_type', 'download')
+    if delivery_type not in DELIVERY_TYPES:
+        raise RowError(f'unknown delivery_type {delivery_type!r}')
+
+    is_active = row.get('is_active', True)
+    if isinstance(is_active, str):
+        is_active = is_active.strip().lower() in TRUE_VALUES
+
+    tags = row.get('tags', '')
+    if isinstance(tags, list):
+        tags = ', '.join(str(tag).strip() for tag in tags)
+
+    slug = slugify(text('slug') or title)
+    if not slug:
+        raise RowError(f'cannot derive a slug from {title!r}')
+
+    description = text('description')
+    return {
+        'title': title[:200],
+        'slug': slug[:200],
+        'description': description,
+        'price': price,
+        'category': category[:100],
+        'tags': str(tags)[:500],
+        'featured_image_url': text('featured_image_url') or None,
+        'demo_video_url': text('demo_video_url'),
+        'download_url': text('download_url'),
+        'delivery_type': delivery_type,
+        'is_active': bool(is_active),
+        'meta_description': text('meta_description', description[:160])[:160],
+    }
+
+
+def upsert_categories(names):
+    """Create any missing categories and return {name: Category}"""
+    existing = {c.name: c for c in Category.objects.filter(name__in=names)}
+    missing = [name for name in names if name not in existing]
+    if missing:
+        Category.objects.bulk_create(
+            [Category(name=name, slug=slugify(name)) for name in missing],
+            ignore_conflicts=True,
+        )
+        existing.update((c.name, c) for c in Category.objects.filter(name__in=missing))
+        # Names that slugify like an existing category's are filed under it
+        by_slug = {c.slug: c for c in Category.objects.filter(slug__in=[slugify(n) for n in missing])}
+        for name in missing:
+            existing.setdefault(name, by_slug.get(slugify(name)))
+    return existing
+
+
+@transaction.atomic
+def upsert_projects(rows, owner):
+    """
+    Insert or update one chunk of cleaned rows keyed on slug.
+
+    Returns (created, updated). bulk_create skips save(), so the values
+    save() would derive are filled in here.
+    """
+    # A slug may appear only once per statement; the last row wins
+    rows = list({row['slug']: row for row in rows}.values())
+    categories = upsert_categories(sorted({row['category'] for row in rows}))
+
+    now = timezone.now()
+    projects = []
+    for row in rows:
+        project = Project(**{**row, 'category': categories[row['category']]}, created_by=owner)
+        project.resolved_image_url = project.resolve_image_url()
+        project.embed_video_url = project.convert_video_url(project.demo_video_url) if project.demo_video_url else ''
+        project.updated_at = now
+        projects.append(project)
+
+    # Categories the existing rows are moving out of need recounting too
+    existing = list(Project.objects.filter(slug__in=[row['slug'] for row in rows]).values_list('category_id', flat=True))
+    Project.objects.bulk_create(
+        projects,
+        update_conflicts=True,
+        unique_fields=['slug'],
+        update_fields=PROJECT_UPDATE_FIELDS,
+    )
+    # bulk_create sends no post_save, so its receivers' work is done here
+    Category.recount_counters({*existing, *(category.pk for category in categories.values() if category)})
+    upserted = list(Project.objects.filter(slug__in=[row['slug'] for row in rows]).values_list('pk', flat=True))
+    index_projects(upserted)
+    CatalogEntry.refresh(upserted)
+    bump_catalog_version()
+    return len(projects) - len(existing), len(existing)
+
+
+def open_text(path):
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    return open(path, encoding='utf-8', newline='')
@@ -0,0 +1,146 @@
+"""
+Faceted navigation for the project list and search results.
+
+Counts come from two grouped queries over the current result set of
+CatalogEntry rows, with no joins. Products are grouped by (category, delivery
+type, price bucket), which gives a few rows however many products match.
+Tags are counted separately over the distinct tag strings, since adding them
+to that grouping would give about one row per product. Both are folded into
+per-facet counts in Python. Counts are cached per normalized query and
+catalog version (projects.result_cache), so a catalog change invalidates them
+all at once.
+"""
+import re
+from collections import Counter
+from urllib.parse import urlencode
+
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from .models import Project
+from .result_cache import cached_result
+
+
+# (value, label, lowest price, price it stays below)
+PRICE_BUCKETS = [
+    ('under-500', 'Under ₹500', None, 500),
+    ('500-2000', '₹500 – ₹2,000', 500, 2000),
+    ('2000-10000', '₹2,000 – ₹10,000', 2000, 10000),
+    ('10000-plus', '₹10,000 and above', 10000, None),
+]
+
+DELIVERY_LABELS = dict(Project.DELIVERY_CHOICES)
+
+# Request parameter and heading of each facet, in display order
+FACETS = [
+    ('category', 'Category'),
+    ('price', 'Price'),
+    ('delivery', 'Delivery'),
+    ('tag', 'Tags'),
+]
+
+MAX_TAGS = 15
+
+# Parameters that change the page shown but not the result set
+IGNORED_PARAMS = {'page', 'sort'}
+
+
+def price_filter(value):
+    for bucket, label, low, high in PRICE_BUCKETS:
+        if bucket == value:
+            condition = Q()
+            if low is not None:
+                condition &= Q(price__gte=low)
+            if high is not None:
+                condition &= Q(price__lt=high)
+            return condition
+    return None
+
+
+def tag_filter(tag):
+    # Whole entries of the comma-separated list only, so "ai" doesn't match "Arduino"
+    return Q(tags__iregex=rf'(^|,)\s*{re.escape(tag)}\s*(,|$)')
+
+
+def apply_facets(queryset, params):
+    """Narrow a CatalogEntry queryset by the selected facet values in `params`"""
+    if params.get('category'):
+        queryset = queryset.filter(category_slug=params['category'])
+    if params.get('price') and price_filter(params['price']) is not None:
+        queryset = queryset.filter(price_filter(params['price']))
+    if params.get('delivery') in DELIVERY_LABELS:
+        queryset = queryset.filter(delivery_type=params['delivery'])
+    if params.get('tag'):
+        queryset = queryset.filter(tag_filter(params['tag']))
+    return queryset
+
+
+def count_facets(queryset):
+    """{'total': .., facet name: [(value, label, count), ...]} for a result set"""
+    bucket = Case(
+        *[When(price_filter(value), then=Value(value)) for value, label, low, high in PRICE_BUCKETS],
+        output_field=CharField(),
+    )
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=bucket)
+        .values('category_slug', 'category_name', 'delivery_type', 'price_bucket')
+        .annotate(count=Count('pk'))
+    )
+    tag_rows = queryset.order_by().values('tags').annotate(count=Count('pk'))
+
+    categories, prices, deliveries, tags = Counter(), Counter(), Counter(), Counter()
+    category_names, tag_labels = {}, {}
+    total = 0
+    for row in rows:
+        count = row['count']
+        total += count
+        categories[row['category_slug']] += count
+        category_names[row['category_slug']] = row['category_name']
+        prices[row['price_bucket']] += count
+        deliveries[row['delivery_type']] += count
+    for row in tag_rows:
+        for tag in {tag.strip() for tag in row['tags'].split(',') if tag.strip()}:
+            tags[tag_labels.setdefault(tag.lower(), tag)] += row['count']
+
+    bucket_labels = {value: label for value, label, low, high in PRICE_BUCKETS}
+    return {
+        'total': total,
+        'category': [(slug, category_names[slug], count) for slug, count in sorted(categories.items(), key=lambda item: category_names[item[0]])],
+        'price': [(value, bucket_labels[value], prices[value]) for value in bucket_labels if prices[value]],
+        'delivery': [(value, DELIVERY_LABELS.get(value, value), count) for value, count in sorted(deliveries.items())],
+        'tag': [(tag, tag, count) for tag, count in tags.most_common(MAX_TAGS)],
+    }
+
+
+def get_facets(queryset, params, namespace, path=''):
+    """
+    Facet groups for a result set, cached per view (`namespace`) and
+    normalized query: the same parameters match different products on
+    different pages.
+
+    Returns {'total': .., 'query': .., 'groups': [{'name', 'label', 'values':
+    [{'value', 'label', 'count', 'selected', 'url'}]}]}. Each url toggles its
+    value, keeping the other parameters but going back to the first page;
+    query is the current parameters without the page, for pagination links.
+    """
+    counts = cached_result(f'facets:{namespace}', params, lambda: count_facets(queryset), ignored=IGNORED_PARAMS)
+
+    base = {key: value for key, value in params.items() if key != 'page' and value}
+    groups = []
+    for name, label in FACETS:
+        values = []
+        for value, value_label, count in counts[name]:
+            selected = params.get(name) == value
+            query = {k: v for k, v in base.items() if k != name}
+            if not selected:
+                query[name] = value
+            values.append({
+                'value': value,
+                'label': value_label,
+                'count': count,
+                'selected': selected,
+                'url': f'{path}?{urlencode(query)}',
+            })
+        if values:
+            groups.append({'name': name, 'label': label, 'values': values})
+    return {'total': counts['total'], 'query': urlencode(base), 'groups': groups}
@@ -0,0 +1,141 @@
+"""
+Typo-tolerant search over project titles and tags.
+
+Text is compared by trigrams, as pg_trgm does: every word padded with two
+spaces in front and one behind, split into three-letter pieces. On
+Postgres the pg_trgm operators and GIN indexes do the matching. Other
+databases use SearchTrigram, a precomputed (trigram, project) table, where
+a candidate's similarity is the share of the query's trigrams it contains.
+
+Candidates above SIMILARITY_THRESHOLD are ranked by a blend of that
+similarity, recency and sales.
+"""
+import re
+from datetime import timedelta
+from math import ceil, log1p
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Project, SearchTrigram
+
+
+# Share of the query's trigrams a match must contain. "djnago" shares 3 of
+# 7 with "django", so this is looser than pg_trgm's default of 0.6
+SIMILARITY_THRESHOLD = 0.4
+
+# Best text matches considered for ranking
+MAX_CANDIDATES = 500
+
+TEXT_WEIGHT = 0.7
+RECENCY_WEIGHT = 0.15
+SALES_WEIGHT = 0.15
+
+# A product this old gets half the recency score of a new one
+RECENCY_HALF_LIFE = timedelta(days=90)
+
+WORD = re.compile(r'[^\W_]+')
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams of the words in `text`"""
+    grams = set()
+    for word in WORD.findall(text.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def uses_pg_trgm():
+    return connection.vendor == 'postgresql'
+
+
+def index_projects(project_ids=None, batch_size=5000):
+    """
+    Rewrite the SearchTrigram rows of some products, or of all of them.
+
+    A no-op on Postgres, where pg_trgm indexes the columns themselves.
+    Returns the number of rows written.
+    """
+    if uses_pg_trgm():
+        return 0
+    projects = Project.objects.all() if project_ids is None else Project.objects.filter(pk__in=project_ids)
+    written = 0
+    with transaction.atomic():
+        if project_ids is None:
+            SearchTrigram.objects.all().delete()
+        else:
+            SearchTrigram.objects.filter(project_id__in=project_ids).delete()
+        rows = []
+        for pk, title, tags in projects.values_list('pk', 'title', 'tags').iterator(chunk_size=2000):
+            rows.extend(SearchTrigram(trigram=gram, project_id=pk) for gram in trigrams(f'{title} {tags}'))
+            if len(rows) >= batch_size:
+                SearchTrigram.objects.bulk_create(rows)
+                written += len(rows)
+                rows = []
+        SearchTrigram.objects.bulk_create(rows)
+    return written + len(rows)
+
+
+def postgres_candidates(queryset, query):
+    """(pk, similarity) of the best matches, found through the pg_trgm GIN indexes"""
+    # django.contrib.postgres needs psycopg2, installed only where Postgres is used
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    matches = (
+        queryset.filter(Q(title__trigram_word_similar=query) | Q(tags__trigram_word_similar=query))
+        .annotate(similarity=Greatest(TrigramWordSimilarity(query, 'title'), TrigramWordSimilarity(query, 'tags')))
+        .order_by('-similarity')
+        .values_list('pk', 'similarity')
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        # The <% operator compares against this setting; is_local limits it to the transaction
+        cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", [str(SIMILARITY_THRESHOLD)])
+        return list(matches[:MAX_CANDIDATES])
+
+
+def trigram_table_candidates(queryset, query):
+    """(pk, similarity) of the best matches, counted from the SearchTrigram table"""
+    grams = trigrams(query)
+    if not grams:
+        return []
+    # Restricted to `queryset` before the cut to MAX_CANDIDATES, so inactive or
+    # filtered-out products can't crowd out the ones that may be shown
+    shared = (
+        SearchTrigram.objects.filter(trigram__in=grams, project__in=queryset.values('pk'))
+        .values('project_id')
+        .annotate(shared=Count('pk'))
+        .filter(shared__gte=ceil(len(grams) * SIMILARITY_THRESHOLD))
+        .order_by('-shared')
+        .values_list('project_id', 'shared')
+    )
+    return [(pk, count / len(grams)) for pk, count in shared[:MAX_CANDIDATES]]
+
+
+def fuzzy_search(queryset, query):
+    """
+    Primary keys of the products in `queryset` resembling `query`, best first.
+
+    The final score is TEXT_WEIGHT * similarity + RECENCY_WEIGHT * recency
+    + SALES_WEIGHT * sales, with recency halving every RECENCY_HALF_LIFE
+    and sales on a log scale relative to the best seller among the matches.
+    """
+    find = postgres_candidates if uses_pg_trgm() else trigram_table_candidates
+    similarity = dict(find(queryset, query))
+    if not similarity:
+        return []
+
+    details = Project.objects.filter(pk__in=similarity).values_list('pk', 'created_at', 'units_sold')
+    details = {pk: (created_at, units_sold) for pk, created_at, units_sold in details}
+    now = timezone.now()
+    top_sales = log1p(max(units_sold for created_at, units_sold in details.values()))
+
+    def score(pk):
+        created_at, units_sold = details[pk]
+        recency = 0.5 ** ((now - created_at) / RECENCY_HALF_LIFE)
+        sales = log1p(units_sold) / top_sales if top_sales else 0
+        return TEXT_WEIGHT * similarity[pk] + RECENCY_WEIGHT * recency + SALES_WEIGHT * sales
+
+    return sorted(details, key=lambda pk: (-score(pk), pk))
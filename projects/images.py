@@ -0,0 +1,292 @@
+"""
+Background image processing for shared ImageAssets.
+
+Saving a model only takes a reference on an ImageAsset and, for bytes not
+seen before, records an ImageJob; `manage.py process_images` claims jobs,
+generates derivatives here, outside the request, and copies the result
+onto every row using the asset. It also fetches images registered with the
+image proxy (projects.proxy).
+"""
+from base64 import b64encode
+from collections import Counter
+from datetime import timedelta
+from io import BytesIO
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps, features
+
+from .models import CatalogEntry, Category, ExternalImage, ImageAsset, ImageJob, Project, ProjectImage
+from .storage import content_addressed_storage, file_digest
+
+
+# Models whose uploads are shared through ImageAsset
+IMAGE_MODELS = (Category, Project, ProjectImage, ExternalImage)
+
+# Longest side of the largest derivative
+MAX_DERIVATIVE_SIZE = 1200
+
+# Widths rendered for srcset below the largest size allowed by
+# MAX_DERIVATIVE_SIZE and the source image, which is always rendered too
+RESPONSIVE_WIDTHS = (320, 480, 800, 1200)
+
+# Longest side of the inline placeholder shown while the real image loads
+PLACEHOLDER_SIZE = 16
+
+MAX_ATTEMPTS = 3
+
+
+def output_formats(has_alpha):
+    """(mime type, PIL format, extension, save options), preferred formats first"""
+    formats = []
+    if features.check('avif'):
+        formats.append(('image/avif', 'AVIF', 'avif', {'quality': 60}))
+    if features.check('webp'):
+        formats.append(('image/webp', 'WEBP', 'webp', {'quality': 80, 'method': 4}))
+    # Fallback for the <img> itself
+    if has_alpha:
+        formats.append(('image/png', 'PNG', 'png', {'optimize': True}))
+    else:
+        formats.append(('image/jpeg', 'JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}))
+    return formats
+
+
+def placeholder_data_uri(image, has_alpha):
+    """A blurry few-hundred-byte copy of the image as a data: URI (LQIP)"""
+    tiny = image.copy()
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = BytesIO()
+    if features.check('webp'):
+        tiny.save(buffer, format='WEBP', quality=40)
+        mime = 'image/webp'
+    else:
+        tiny.convert('RGB').save(buffer, format='JPEG', quality=40)
+        mime = 'image/jpeg'
+    return f'data:{mime};base64,{b64encode(buffer.getvalue()).decode()}'
+
+
+def derivative_path(name, label, extension):
+    root, _ = os.path.splitext(name)
+    return f'derivatives/{root}_{label}.{extension}'
+
+
+def target_widths(largest):
+    widths = [w for w in RESPONSIVE_WIDTHS if w < largest]
+    return widths + [largest]
+
+
+def generate_derivatives(field_file, max_size):
+    """
+    Render every width/format derivative of an uploaded image.
+
+    Returns the manifest stored in image_derivatives:
+    {'display': fallback path of the largest width, 'width': .., 'height': ..,
+     'srcset': {mime type: [[width, path], ...]}, 'placeholder': data: URI}
+    """
+    with field_file.open('rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    has_alpha = image.mode in ('RGBA', 'LA', 'P')
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    # max_size bounds the longest side, so portrait images get narrower widths
+    scale = min(1.0, max_size / max(image.size))
+    widths = target_widths(max(1, round(image.width * scale)))
+
+    srcset = {}
+    manifest = {'srcset': srcset, 'placeholder': placeholder_data_uri(image, has_alpha)}
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for mime, pil_format, extension, options in output_formats(has_alpha):
+            buffer = BytesIO()
+            resized.save(buffer, format=pil_format, **options)
+            path = default_storage.save(
+                derivative_path(field_file.name, f'w{width}', extension),
+                ContentFile(buffer.getvalue()),
+            )
+            srcset.setdefault(mime, []).append([width, path])
+        manifest.update(width=width, height=height)
+
+    # The last format listed is the universally supported fallback
+    fallback = srcset[output_formats(has_alpha)[-1][0]]
+    manifest['display'] = fallback[-1][1]
+    return manifest
+
+
+def derivative_paths(manifest):
+    paths = {manifest.get('display')}
+    for entries in (manifest.get('srcset') or {}).values():
+        paths.update(path for width, path in entries)
+    paths.discard(None)
+    return paths
+
+
+def delete_derivatives(manifest, keep=None):
+    for path in derivative_paths(manifest) - derivative_paths(keep or {}):
+        default_storage.delete(path)
+
+
+def rows_using(asset):
+    """Querysets of every row whose upload is this asset's file"""
+    return [
+        model.objects.filter(**{model.processed_image_field: asset.file.name})
+        for model in IMAGE_MODELS
+    ]
+
+
+def fetch_external_image(image):
+    """Download a proxied image once and store it like an upload"""
+    fetcher = import_string(settings.IMAGE_PROXY_FETCHER)
+    data = fetcher(Project.convert_google_drive_url(image.source_url))
+
+    # Refuse anything Pillow can't read before it reaches storage
+    with Image.open(BytesIO(data)) as probe:
+        extension = probe.format.lower()
+        probe.verify()
+
+    # Saving takes a reference on the shared asset, which queues its processing
+    image.file.save(f'external.{extension}', ContentFile(data), save=False)
+    image.fetched_at = timezone.now()
+    image.save()
+
+
+def refresh_entries(rows):
+    # update() skips Project.save(), which keeps the catalog snapshot current
+    if rows.model is Project:
+        CatalogEntry.refresh(rows.values_list('pk', flat=True))
+
+
+def process_job(job):
+    """Generate derivatives for a job's asset and mark every row using it ready"""
+    asset = job.target
+    if isinstance(asset, ExternalImage):
+        fetch_external_image(asset)
+        return
+    if not isinstance(asset, ImageAsset):
+        # Asset released since, or a job queued per row before assets existed
+        # (`process_images --backfill` re-queues those as assets)
+        return
+
+    previous = asset.derivatives or {}
+    derivatives = generate_derivatives(asset.file, MAX_DERIVATIVE_SIZE)
+    # update() rather than save() so processing doesn't queue another job
+    ImageAsset.objects.filter(pk=asset.pk).update(status='ready', derivatives=derivatives)
+    for rows in rows_using(asset):
+        rows.update(image_status='ready', image_derivatives=derivatives)
+        refresh_entries(rows)
+    delete_derivatives(previous, keep=derivatives)
+
+
+def mark_failed(job):
+    asset = job.target
+    if isinstance(asset, ExternalImage):
+        ExternalImage.objects.filter(pk=asset.pk).update(image_status='failed')
+    elif isinstance(asset, ImageAsset):
+        ImageAsset.objects.filter(pk=asset.pk).update(status='failed')
+        for rows in rows_using(asset):
+            rows.update(image_status='failed')
+            refresh_entries(rows)
+
+
+def sync_assets(reprocess=False):
+    """
+    Rebuild ImageAssets and their reference counts from the rows that use them.
+
+    Covers uploads made before content addressing, merging byte-identical
+    files onto one asset. Queues processing for assets that are not ready
+    (or all of them with reprocess) and returns how many were queued.
+    """
+    references = Counter()
+    for model in IMAGE_MODELS:
+        field = model.processed_image_field
+        names = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        references.update(names.values_list(field, flat=True))
+
+    counts = Counter()
+    for name, count in references.items():
+        asset = ImageAsset.objects.filter(file=name).first()
+        if asset is None:
+            if not content_addressed_storage.exists(name):
+                continue
+            with content_addressed_storage.open(name) as stored:
+                digest = file_digest(stored)
+            asset, _ = ImageAsset.objects.get_or_create(digest=digest, defaults={'file': name})
+            if asset.file.name != name:
+                for model in IMAGE_MODELS:
+                    field = model.processed_image_field
+                    model.objects.filter(**{field: name}).update(**{field: asset.file.name})
+                content_addressed_storage.delete(name)
+        counts[asset.pk] += count
+
+    assets = list(ImageAsset.objects.all())
+    for asset in assets:
+        asset.ref_count = counts[asset.pk]
+    ImageAsset.objects.bulk_update(assets, ['ref_count'], batch_size=500)
+
+    queued = 0
+    for asset in assets:
+        if asset.ref_count and (reprocess or asset.status != 'ready'):
+            ImageJob.enqueue(asset, 'file')
+            queued += 1
+        elif asset.status == 'ready':
+            for rows in rows_using(asset):
+                rows.exclude(image_status='ready').update(image_status='ready', image_derivatives=asset.derivatives)
+                refresh_entries(rows)
+    return queued
+
+
+def claim_job(job_id):
+    """Atomically move a pending job to processing; returns the job or None"""
+    claimed = ImageJob.objects.filter(pk=job_id, status='pending').update(
+        status='processing',
+        attempts=F('attempts') + 1,
+        updated_at=timezone.now(),
+    )
+    return ImageJob.objects.get(pk=job_id) if claimed else None
+
+
+def run_job(job):
+    try:
+        process_job(job)
+    except Exception as exc:
+        job.error = f'{type(exc).__name__}: {exc}'
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = 'failed'
+            mark_failed(job)
+        else:
+            job.status = 'pending'
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        return False
+
+    job.status = 'done'
+    job.error = ''
+    job.save(update_fields=['status', 'error', 'updated_at'])
+    return True
+
+
+def run_pending_jobs(limit):
+    """Claim and run up to `limit` pending jobs; returns (processed, failed)"""
+    processed = failed = 0
+    job_ids = list(ImageJob.objects.filter(status='pending').values_list('id', flat=True)[:limit])
+    for job_id in job_ids:
+        job = claim_job(job_id)
+        if job is None:
+            # Another worker got there first
+            continue
+        processed += 1
+        if not run_job(job):
+            failed += 1
+    return processed, failed
+
+
+def requeue_stale_jobs(minutes):
+    """Return jobs abandoned by a crashed worker to the queue"""
+    cutoff = timezone.now() - timedelta(minutes=minutes)
+    return ImageJob.objects.filter(status='processing', updated_at__lt=cutoff).update(status='pending')
@@ -0,0 +1,94 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from projects.fuzzy import fuzzy_search, index_projects, uses_pg_trgm
+from projects.models import CatalogEntry, Category, Project
+
+
+WORDS = [
+    'arduino', 'raspberry', 'pi', 'django', 'python', 'drone', 'quadcopter', 'robot', 'sensor',
+    'machine', 'learning', 'neural', 'network', 'vision', 'camera', 'solar', 'tracker', 'smart',
+    'home', 'automation', 'weather', 'station', 'gesture', 'controlled', 'car', 'bluetooth',
+    'wifi', 'esp32', 'irrigation', 'system', 'attendance', 'face', 'recognition', 'chatbot',
+    'voice', 'assistant', 'line', 'follower', 'obstacle', 'avoiding', 'gps', 'monitoring',
+    'heart', 'rate', 'health', 'parking', 'traffic', 'light', 'security', 'alarm', 'fire', 'surveillance',
+]
+
+# Misspelled the way users type them
+QUERIES = ['djnago', 'ardiuno', 'raspbery pi', 'dron', 'machin lerning', 'survelance', 'quadcoptr', 'blutooth car']
+
+
+class Command(BaseCommand):
+    help = 'Time exact and fuzzy search on a synthetic catalog, which is rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000, help='Synthetic products to create')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs of each query')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        with transaction.atomic():
+            started = time.monotonic()
+            self.create_catalog(rng, options['products'])
+            backend = 'pg_trgm' if uses_pg_trgm() else 'SearchTrigram table'
+            self.stdout.write(
+                f"Created {options['products']} products in {time.monotonic() - started:.1f}s ({backend})"
+            )
+
+            active = Project.objects.filter(is_active=True)
+            for label, search in (('exact', self.exact_search), ('fuzzy', fuzzy_search)):
+                timings, matches = [], 0
+                for query in QUERIES:
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        results = search(active, query)
+                        list(CatalogEntry.objects.filter(pk__in=list(results[:12])))  # hydrate a page
+                        timings.append((time.perf_counter() - started) * 1000)
+                    matches += len(results) > 0
+                timings.sort()
+                self.stdout.write(
+                    f'{label}: {matches}/{len(QUERIES)} queries matched, '
+                    f'median {statistics.median(timings):.1f} ms, p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms'
+                )
+
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Synthetic catalog rolled back'))
+
+    def exact_search(self, queryset, query):
+        # What SearchView does without fuzzy matching: the denormalized
+        # CatalogEntry table, with no join to Project or Category
+        return list(CatalogEntry.objects.filter(
+            Q(title__icontains=query) | Q(description__icontains=query) |
+            Q(tags__icontains=query) | Q(category_name__icontains=query)
+        ).values_list('pk', flat=True)[:500])
+
+    def create_catalog(self, rng, count):
+        owner = User.objects.create(username=f'benchmark-{rng.random()}')
+        categories = [Category.objects.create(name=f'Benchmark {i}', slug=f'benchmark-{i}') for i in range(20)]
+        batch = []
+        for i in range(count):
+            title = ' '.join(rng.sample(WORDS, rng.randint(2, 4))).title()
+            batch.append(Project(
+                title=f'{title} {i}',
+                slug=f'benchmark-{i}',
+                description=f'{title} project kit with code and documentation',
+                price=rng.randint(100, 20000),
+                category=rng.choice(categories),
+                tags=', '.join(rng.sample(WORDS, 2)),
+                created_by=owner,
+                units_sold=int(rng.paretovariate(1.5)) - 1,
+            ))
+            if len(batch) == 5000:
+                Project.objects.bulk_create(batch)
+                batch = []
+        Project.objects.bulk_create(batch)
+        # bulk_create() skips save(), which keeps the catalog snapshot and search index current
+        created = list(Project.objects.filter(slug__startswith='benchmark-').values_list('pk', flat=True))
+        index_projects(created)
+        CatalogEntry.refresh(created)
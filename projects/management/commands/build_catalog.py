@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from projects.models import CatalogEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the public catalog snapshot (CatalogEntry) and reassign sales ranks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rank-only', action='store_true', help='Only reassign sales ranks (run after sales come in)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Entries written per query')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if not options['rank_only']:
+            written = CatalogEntry.refresh(batch_size=options['batch_size'])
+            self.stdout.write(f'Wrote {written} catalog entries')
+
+        ranked = CatalogEntry.rank()
+        self.stdout.write(self.style.SUCCESS(
+            f'Reassigned {ranked} sales ranks in {time.monotonic() - started:.1f}s'
+        ))
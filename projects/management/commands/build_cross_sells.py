@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from projects.recommendations import (
+    MIN_JACCARD, MIN_LIFT, MIN_SUPPORT, count_new_orders, rank_cross_sells, reset_cross_sells,
+)
+
+
+class Command(BaseCommand):
+    help = 'Update "customers also bought" cross-sells with orders paid or refunded since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recount every paid order instead of only new ones')
+        parser.add_argument('--limit', type=int, default=8, help='Cross-sells ranked per product')
+        parser.add_argument('--min-support', type=int, default=MIN_SUPPORT, help='Orders a pair must share')
+        parser.add_argument('--min-lift', type=float, default=MIN_LIFT, help='Lowest lift of a ranked pair')
+        parser.add_argument('--min-jaccard', type=float, default=MIN_JACCARD, help='Lowest Jaccard similarity of a ranked pair')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Orders counted per transaction')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['full']:
+            reset_cross_sells()
+
+        added, removed = count_new_orders(options['batch_size'])
+        self.stdout.write(f'Counted {added} new orders, removed {removed} refunded')
+
+        ranked = rank_cross_sells(
+            options['limit'],
+            min_support=options['min_support'],
+            min_lift=options['min_lift'],
+            min_jaccard=options['min_jaccard'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Ranked {ranked} cross-sells in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from projects.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed related products from co-purchases and shared tags'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=8, help='Neighbors stored per product')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        products, rows = build_recommendations(options['limit'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {rows} related products for {products} products in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,75 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.catalog import FORMATS, RowError, clean_row, guess_format, open_text, read_rows, upsert_projects
+
+
+class Command(BaseCommand):
+    help = 'Bulk import (insert or update by slug) categories and projects from JSON, JSONL or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Catalog file, or '-' for stdin")
+        parser.add_argument('--format', choices=FORMATS, help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per upsert')
+        parser.add_argument('--owner', help='Username recorded as created_by on new projects (default: first superuser)')
+        parser.add_argument('--max-errors', type=int, default=100, help='Abort after this many invalid rows')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the input without writing anything')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or guess_format(options['path'])
+        if fmt is None:
+            raise CommandError('Cannot tell the input format; pass --format')
+
+        if options['owner']:
+            owner = User.objects.filter(username=options['owner']).first()
+            if owner is None:
+                raise CommandError(f"No user named {options['owner']!r} for --owner")
+        else:
+            owner = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if owner is None and not options['dry_run']:
+            raise CommandError('No owner for imported projects; create a superuser or pass --owner')
+
+        started = time.perf_counter()
+        created = updated = invalid = valid = 0
+        batch = []
+
+        def flush():
+            nonlocal created, updated, valid
+            valid += len(batch)
+            if batch and not options['dry_run']:
+                new, changed = upsert_projects(batch, owner)
+                created += new
+                updated += changed
+            batch.clear()
+
+        with open_text(options['path']) as stream:
+            for line, row in read_rows(stream, fmt):
+                try:
+                    batch.append(clean_row(row))
+                except RowError as exc:
+                    invalid += 1
+                    self.stderr.write(f'Row {line}: {exc}')
+                    if invalid >= options['max_errors']:
+                        flush()
+                        raise CommandError(f'Stopped after {invalid} invalid rows')
+                    continue
+                if len(batch) >= options['batch_size']:
+                    flush()
+            flush()
+
+        elapsed = time.perf_counter() - started
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Dry run: {valid} valid rows, {invalid} invalid, nothing written ({elapsed:.1f}s)'
+            ))
+            return
+
+        total = created + updated
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} projects ({created} new, {updated} updated, {invalid} invalid) '
+            f'in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} rows/s)'
+        ))
+        if total:
+            self.stdout.write('Run `manage.py process_images --backfill` if imported rows need image processing')
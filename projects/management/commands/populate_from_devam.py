@@ -1,24 +1,69 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 import json
+import re
 from pathlib import Path
 from projects.models import Project, Category, ProjectImage
 import random
 from decimal import Decimal
 
+# Alt text marking logos and generic icons, which make poor product images
+SKIP_WORDS = ['logo', 'icon', 'shape', 'globe']
+
+# Images kept per project; matching stops collecting once a project has this many
+MAX_PROJECT_IMAGES = 3
+
+# Leftover images kept for the additional projects, each of which samples two
+REMAINING_POOL_SIZE = 50
+
+
+def keyword_pattern(words):
+    """One regex matching any of the words, longest first so overlaps prefer the longer word"""
+    return re.compile('|'.join(re.escape(word) for word in sorted(set(words), key=len, reverse=True)))
+
+
+def iter_scraped_images(path):
+    """
+    Yield (image, page record) from scraped data without loading it whole.
+
+    JSONL (scrape_devam.py's output) is read a line at a time; the legacy
+    single-document JSON has to be parsed in one go.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        if path.suffix == '.jsonl':
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    for image in record.get('images', []):
+                        yield image, record
+        else:
+            data = json.load(file)
+            record = {'url': data.get('source_url', ''), 'fetched_at': data.get('scraped_at', '')}
+            for image in data['images']:
+                yield image, record
+
+
 class Command(BaseCommand):
     help = 'Populate projects with data from scraped Devam Project images'
 
-    def handle(self, *args, **kwargs):
-        json_file_path = Path('devam_scraped_data.json')
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--input',
+            help='Scraped data (default: devam_scraped_data.jsonl, else devam_scraped_data.json)',
+        )
+
+    def handle(self, *args, **options):
+        if options['input']:
+            json_file_path = Path(options['input'])
+        else:
+            json_file_path = Path('devam_scraped_data.jsonl')
+            if not json_file_path.exists():
+                json_file_path = Path('devam_scraped_data.json')
 
         if not json_file_path.exists():
-            self.stdout.write(self.style.ERROR('JSON file not found. Make sure devam_scraped_data.json is in the project root.'))
+            self.stdout.write(self.style.ERROR(f'{json_file_path} not found. Run scrape_devam.py or pass --input.'))
             return
 
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-
         # Get or create a superuser
         admin_user, created = User.objects.get_or_create(
             username='admin',
@@ -82,29 +127,55 @@ class Command(BaseCommand):
             if created:
                 self.stdout.write(f'Created category: {category.name}')
 
-        # Filter useful images (exclude logos and generic icons)
-        useful_images = []
-        for img in data['images']:
+        # Match every image against every template in a single pass: one regex
+        # finds all keywords in the alt text and the index maps them to templates
+        skip_re = keyword_pattern(SKIP_WORDS)
+        keyword_re = keyword_pattern(kw for template in project_templates for kw in template['image_keywords'])
+        templates_by_keyword = {}
+        for index, template in enumerate(project_templates):
+            for keyword in template['image_keywords']:
+                templates_by_keyword.setdefault(keyword, []).append(index)
+
+        matches = [[] for _ in project_templates]
+        project_fallback = []
+        # Reservoir sample of leftover images for the additional projects to
+        # draw from, so memory stays constant however large the input is
+        remaining_sample = []
+        useful_count = total_count = remaining_count = 0
+        source = {}
+
+        for img, record in iter_scraped_images(json_file_path):
+            total_count += 1
+            source = source or record
             alt_text = img['alt'].lower()
-            # Skip logos and generic icons
-            if not any(skip in alt_text for skip in ['logo', 'icon', 'shape', 'globe']):
-                useful_images.append(img)
+            if skip_re.search(alt_text):
+                continue
+            useful_count += 1
 
-        self.stdout.write(f'Found {len(useful_images)} useful images out of {len(data["images"])} total images')
+            matched = {index for keyword in keyword_re.findall(alt_text) for index in templates_by_keyword[keyword]}
+            for index in matched:
+                if len(matches[index]) < MAX_PROJECT_IMAGES:
+                    matches[index].append(img)
+
+            if 'project' in alt_text and len(project_fallback) < 2:
+                project_fallback.append(img)
+
+            if img['alt'] not in ['project-img', 'team-img', 'blog-img']:
+                remaining_count += 1
+                if len(remaining_sample) < REMAINING_POOL_SIZE:
+                    remaining_sample.append(img)
+                else:
+                    slot = random.randrange(remaining_count)
+                    if slot < REMAINING_POOL_SIZE:
+                        remaining_sample[slot] = img
+
+        self.stdout.write(f'Found {useful_count} useful images out of {total_count} total images')
 
         # Create projects
         created_projects = 0
-        for template in project_templates:
-            # Find matching images for this project
-            matching_images = []
-            for img in useful_images:
-                alt_text = img['alt'].lower()
-                if any(keyword in alt_text for keyword in template['image_keywords']):
-                    matching_images.append(img)
-
-            if not matching_images:
-                # If no specific matches, use some general project images
-                matching_images = [img for img in useful_images if 'project' in img['alt'].lower()][:2]
+        for index, template in enumerate(project_templates):
+            # If no specific matches, use some general project images
+            matching_images = matches[index] or project_fallback
 
             # Create the project
             category = Category.objects.get(name=template['category'])
@@ -134,8 +205,7 @@ class Command(BaseCommand):
             self.stdout.write(f'Created project: {project.title} with {len(matching_images)} images')
 
         # Add some additional projects with remaining images
-        remaining_images = [img for img in useful_images if img['alt'] not in ['project-img', 'team-img', 'blog-img']]
-        if remaining_images:
+        if remaining_sample:
             additional_templates = [
                 {
                     'title': 'IT Consulting Services Platform',
@@ -172,8 +242,8 @@ class Command(BaseCommand):
                 )
 
                 # Add random images to the description
-                if remaining_images:
-                    random_images = random.sample(remaining_images, min(2, len(remaining_images)))
+                if remaining_sample:
+                    random_images = random.sample(remaining_sample, min(2, len(remaining_sample)))
                     project.description += f"\n\nFeatured Images:\n"
                     for img in random_images:
                         project.description += f"- {img['alt']}: {img['url']}\n"
@@ -194,7 +264,7 @@ class Command(BaseCommand):
                 f'Created {created_projects} new projects\n'
                 f'Total projects in database: {total_projects}\n'
                 f'Total project images: {total_images}\n'
-                f'Source: {data["source_url"]}\n'
-                f'Scraped on: {data["scraped_at"]}'
+                f'Source: {source.get("url", "")}\n'
+                f'Scraped on: {source.get("fetched_at", "")}'
             )
         )
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from projects.images import requeue_stale_jobs, run_pending_jobs, sync_assets
+
+
+class Command(BaseCommand):
+    help = 'Run the background image processing worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--batch-size', type=int, default=20, help='Jobs claimed per poll')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--stale-minutes', type=int, default=15, help='Requeue jobs stuck in processing this long')
+        parser.add_argument('--backfill', action='store_true', help='Rebuild shared image assets and queue every one not yet processed')
+        parser.add_argument('--reprocess', action='store_true', help='With --backfill, also queue images that are already processed')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.backfill(options['reprocess'])
+
+        self.stdout.write('Image worker started')
+        while True:
+            requeued = requeue_stale_jobs(options['stale_minutes'])
+            if requeued:
+                self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+
+            processed, failed = run_pending_jobs(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Processed {processed} images ({failed} failed)')
+                continue
+
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS('Image queue is empty'))
+
+    def backfill(self, reprocess):
+        queued = sync_assets(reprocess=reprocess)
+        self.stdout.write(f'Queued {queued} images for processing')
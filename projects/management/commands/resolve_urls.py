@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from projects.models import CatalogEntry, Category, Project, ProjectImage
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the stored image and video embed URLs. Run after upgrading, '
+        'and after changing IMAGE_PROXY_ENABLED or SECRET_KEY'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows written per bulk update')
+
+    def handle(self, *args, **options):
+        for model in (Category, Project, ProjectImage):
+            fields = ['resolved_image_url']
+            if model is Project:
+                fields.append('embed_video_url')
+
+            changed = []
+            for obj in model.objects.iterator(chunk_size=options['batch_size']):
+                before = [getattr(obj, field) for field in fields]
+                obj.resolved_image_url = obj.resolve_image_url()
+                if model is Project:
+                    obj.embed_video_url = obj.convert_video_url(obj.demo_video_url) if obj.demo_video_url else ''
+                if [getattr(obj, field) for field in fields] != before:
+                    changed.append(obj)
+
+            model.objects.bulk_update(changed, fields, batch_size=options['batch_size'])
+            if model is Project and changed:
+                # bulk_update() skips save(), which keeps the listing copy of the image URL current
+                CatalogEntry.refresh([obj.pk for obj in changed], batch_size=options['batch_size'])
+            self.stdout.write(f'{model._meta.verbose_name_plural.capitalize()}: updated {len(changed)}')
+
+        self.stdout.write(self.style.SUCCESS('Stored URLs are up to date'))
@@ -0,0 +1,25 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from projects.search_analytics import prune_search_logs, rollup_searches
+
+
+class Command(BaseCommand):
+    help = 'Roll the search log up into daily per-query stats for the admin search report (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Day to roll up (YYYY-MM-DD), by default yesterday')
+        parser.add_argument('--days', type=int, default=1, help='Days to roll up, ending with --date')
+        parser.add_argument('--keep-days', type=int, default=30, help='Days of raw search log to keep')
+
+    def handle(self, *args, **options):
+        last = options['date'] or timezone.localdate() - timedelta(days=1)
+        for offset in range(options['days'] - 1, -1, -1):
+            day = last - timedelta(days=offset)
+            written = rollup_searches(day)
+            self.stdout.write(f'{day}: {written} queries')
+
+        pruned = prune_search_logs(options['keep_days'])
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {options["days"]} days, pruned {pruned} old log rows'))
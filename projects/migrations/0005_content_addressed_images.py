@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:02
+
+from django.db import migrations, models
+import projects.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_image_processing_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(help_text='BLAKE2b digest of the file', max_length=64, unique=True)),
+                ('file', models.ImageField(max_length=255, storage=projects.storage.ContentAddressedStorage(), unique=True, upload_to='images/')),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('derivatives', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], editable=False, max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=projects.storage.ContentAddressedStorage(), upload_to='images/'),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='featured_image',
+            field=models.ImageField(blank=True, null=True, storage=projects.storage.ContentAddressedStorage(), upload_to='images/'),
+        ),
+        migrations.AlterField(
+            model_name='projectimage',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=projects.storage.ContentAddressedStorage(), upload_to='images/'),
+        ),
+    ]
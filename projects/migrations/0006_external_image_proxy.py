@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:05
+
+from django.db import migrations, models
+import projects.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExternalImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image_status', models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], editable=False, max_length=10)),
+                ('image_derivatives', models.JSONField(blank=True, default=dict, editable=False)),
+                ('url_hash', models.CharField(max_length=64, unique=True)),
+                ('source_url', models.TextField()),
+                ('file', models.ImageField(blank=True, max_length=255, storage=projects.storage.ContentAddressedStorage(), upload_to='images/')),
+                ('fetched_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
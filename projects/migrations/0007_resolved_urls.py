@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_external_image_proxy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='resolved_image_url',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='externalimage',
+            name='resolved_image_url',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='embed_video_url',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='resolved_image_url',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='projectimage',
+            name='resolved_image_url',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
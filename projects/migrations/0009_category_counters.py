@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:15
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def count_existing(apps, schema_editor):
+    Category = apps.get_model('projects', 'Category')
+    Project = apps.get_model('projects', 'Project')
+    projects = Project.objects.filter(category=OuterRef('pk')).order_by().values('category')
+    Category.objects.update(
+        active_project_count=Coalesce(Subquery(projects.filter(is_active=True).annotate(count=Count('pk')).values('count')), 0),
+        units_sold=Coalesce(Subquery(projects.annotate(total=Sum('units_sold')).values('total')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0008_sales_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='active_project_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='units_sold',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['-units_sold'], name='projects_ca_units_s_f9aa62_idx'),
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+
+
+def add_trigram_indexes(apps, schema_editor):
+    """pg_trgm GIN indexes on Postgres; a filled SearchTrigram table elsewhere"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in ('title', 'tags'):
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS projects_project_{column}_trgm '
+                f'ON projects_project USING gin ({column} gin_trgm_ops)'
+            )
+        return
+
+    # Same trigrams as projects.fuzzy.trigrams()
+    Project = apps.get_model('projects', 'Project')
+    SearchTrigram = apps.get_model('projects', 'SearchTrigram')
+    rows = []
+    for pk, title, tags in Project.objects.values_list('pk', 'title', 'tags').iterator():
+        grams = set()
+        for word in re.findall(r'[^\W_]+', f'{title} {tags}'.lower()):
+            padded = f'  {word} '
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        rows.extend(SearchTrigram(trigram=gram, project_id=pk) for gram in grams)
+        if len(rows) >= 5000:
+            SearchTrigram.objects.bulk_create(rows)
+            rows = []
+    SearchTrigram.objects.bulk_create(rows)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for column in ('title', 'tags'):
+            schema_editor.execute(f'DROP INDEX IF EXISTS projects_project_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0011_cross_sells'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='projects.project')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchtrigram',
+            constraint=models.UniqueConstraint(fields=('trigram', 'project'), name='unique_search_trigram'),
+        ),
+        migrations.RunPython(add_trigram_indexes, drop_trigram_indexes),
+    ]
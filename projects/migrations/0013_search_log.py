@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:31
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0012_search_trigrams'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=200)),
+                ('results', models.PositiveIntegerField()),
+                ('latency_ms', models.PositiveIntegerField()),
+                ('fuzzy', models.BooleanField(default=False)),
+                ('searched_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False)),
+            ],
+            options={
+                'ordering': ['-searched_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('query', models.CharField(max_length=200)),
+                ('searches', models.PositiveIntegerField(default=0)),
+                ('zero_results', models.PositiveIntegerField(default=0)),
+                ('fuzzy', models.PositiveIntegerField(default=0)),
+                ('total_latency_ms', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-date', '-searches'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchstat',
+            constraint=models.UniqueConstraint(fields=('date', 'query'), name='unique_search_stat'),
+        ),
+    ]
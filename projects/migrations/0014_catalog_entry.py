@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0013_search_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogEntry',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='catalog_entry', serialize=False, to='projects.project')),
+                ('title', models.CharField(max_length=200)),
+                ('slug', models.SlugField(max_length=200)),
+                ('description', models.TextField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('delivery_type', models.CharField(max_length=10)),
+                ('tags', models.CharField(blank=True, max_length=500)),
+                ('category_id', models.BigIntegerField()),
+                ('category_name', models.CharField(max_length=100)),
+                ('category_slug', models.SlugField(max_length=100)),
+                ('image_url', models.TextField(blank=True)),
+                ('image_derivatives', models.JSONField(blank=True, default=dict)),
+                ('sales_rank', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Catalog entries',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['-created_at'], name='projects_ca_created_d3cc80_idx'), models.Index(fields=['category_id', '-created_at'], name='projects_ca_categor_3530db_idx'), models.Index(fields=['sales_rank'], name='projects_ca_sales_r_c69bb1_idx')],
+            },
+        ),
+    ]
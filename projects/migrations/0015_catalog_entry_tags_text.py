@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0014_catalog_entry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='catalogentry',
+            name='tags',
+            field=models.TextField(blank=True),
+        ),
+    ]
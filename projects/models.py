@@ -1,41 +1,204 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.storage import default_storage
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
 import uuid
-from PIL import Image
+from .proxy import proxy_url, url_hash
+from .signals import bump_catalog_version, products_changed
+from .storage import content_addressed_storage, digest_from_name, file_digest
 
 
-class Category(models.Model):
+class ProcessedImageMixin(models.Model):
+    """
+    Tracks the uploaded image in `processed_image_field`.
+    
+    Uploads are stored content-addressed and shared through ImageAsset, so
+    identical images cost one file and are processed once (see
+    projects.images). Derivative state is copied onto each row so templates
+    never need a join.
+    """
+    IMAGE_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
+    image_status = models.CharField(max_length=10, choices=IMAGE_STATUS_CHOICES, blank=True, editable=False)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    # External image URL as rendered, worked out on save rather than on every page view
+    resolved_image_url = models.TextField(blank=True, editable=False)
+    
+    processed_image_field = None
+    # URL field that takes priority over the upload when filled in
+    external_image_field = None
+    
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image_name = instance._current_image_name()
+        return instance
+    
+    def _current_image_name(self):
+        # Read the raw value so deferred fields aren't loaded just for this check
+        value = self.__dict__.get(self.processed_image_field)
+        return getattr(value, 'name', value) or ''
+    
+    def save(self, *args, **kwargs):
+        previous_name = getattr(self, '_loaded_image_name', '')
+        image_changed = (
+            self.processed_image_field in self.__dict__
+            and self._current_image_name() != previous_name
+        )
+        if image_changed:
+            self.image_status = 'pending' if self._current_image_name() else ''
+            self.image_derivatives = {}
+        
+        if self.external_image_field:
+            self.resolved_image_url = self.resolve_image_url()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and self.external_image_field in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'resolved_image_url']
+        
+        # The row, its asset reference and the processing job are written together,
+        # so a failure part way can't leave an image that is never processed
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            
+            if image_changed:
+                # Take the new reference before dropping the old one, in case both are the same asset
+                field_file = getattr(self, self.processed_image_field)
+                if field_file:
+                    self._attach_asset(ImageAsset.acquire(field_file))
+                if previous_name:
+                    ImageAsset.release(previous_name)
+        self._loaded_image_name = self._current_image_name()
+    
+    def _attach_asset(self, asset):
+        """Point this row at the shared asset and copy its derivative state"""
+        field_file = getattr(self, self.processed_image_field)
+        updates = {
+            'image_status': asset.status,
+            'image_derivatives': asset.derivatives,
+        }
+        if asset.file.name != field_file.name:
+            # Same bytes are already stored under another name
+            updates[self.processed_image_field] = asset.file.name
+            field_file.name = asset.file.name
+        type(self).objects.filter(pk=self.pk).update(**updates)
+        self.image_status = asset.status
+        self.image_derivatives = asset.derivatives
+    
+    def get_derivative_url(self, name):
+        """URL of a generated derivative, or None until processing has finished"""
+        path = self.image_derivatives.get(name) if self.image_status == 'ready' else None
+        if not path:
+            return None
+        return default_storage.url(path)
+    
+    def resolve_image_url(self):
+        """URL for the external image, through the image proxy when IMAGE_PROXY_ENABLED is set"""
+        url = getattr(self, self.external_image_field)
+        if not url:
+            return ''
+        if settings.IMAGE_PROXY_ENABLED:
+            return proxy_url(url)
+        return Project.convert_google_drive_url(url)
+    
+    def get_external_image_url(self):
+        # Rows saved before resolved_image_url existed fall back until `manage.py resolve_urls` runs
+        return self.resolved_image_url or self.resolve_image_url()
+    
+    def get_placeholder(self):
+        """Tiny inline data: URI to show while the image loads, if processed"""
+        if self.image_status != 'ready' or (self.external_image_field and getattr(self, self.external_image_field)):
+            return None
+        return self.image_derivatives.get('placeholder')
+    
+    def get_srcsets(self):
+        """{mime type: srcset string} for the responsive derivatives"""
+        if self.image_status != 'ready' or (self.external_image_field and getattr(self, self.external_image_field)):
+            return {}
+        return {
+            mime: ', '.join(f'{default_storage.url(path)} {width}w' for width, path in entries)
+            for mime, entries in self.image_derivatives.get('srcset', {}).items()
+        }
+
+
+class Category(ProcessedImageMixin, models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
     description = models.TextField(blank=True)
-    image = models.ImageField(upload_to='categories/images/', blank=True, null=True)
+    image = models.ImageField(upload_to='images/', storage=content_addressed_storage, blank=True, null=True)
     image_url = models.URLField(blank=True, null=True, help_text="External image URL (e.g., Google Drive link)")
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Kept up to date by the Project signal receivers below and by
+    # orders.Order.record_sales() (`manage.py rebuild_sales_counters` recomputes them)
+    active_project_count = models.PositiveIntegerField(default=0, editable=False)
+    units_sold = models.PositiveIntegerField(default=0, editable=False)
+    
+    processed_image_field = 'image'
+    external_image_field = 'image_url'
+    
     class Meta:
         verbose_name_plural = "Categories"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['-units_sold']),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
     
+    @classmethod
+    def adjust_counters(cls, pk, active_projects=0, units=0):
+        """Add to one category's counters in the database, without reading them first"""
+        if pk is None or not (active_projects or units):
+            return
+        cls.objects.filter(pk=pk).update(
+            active_project_count=Greatest(F('active_project_count') + active_projects, Value(0)),
+            units_sold=Greatest(F('units_sold') + units, Value(0)),
+        )
+    
+    @classmethod
+    def recount_counters(cls, category_ids=None):
+        """Recompute counters from the products table, for writes that bypass Project signals"""
+        projects = Project.objects.filter(category=OuterRef('pk')).order_by().values('category')
+        active = projects.filter(is_active=True).annotate(count=Count('pk')).values('count')
+        units = projects.annotate(total=Sum('units_sold')).values('total')
+        categories = cls.objects.all() if category_ids is None else cls.objects.filter(pk__in=category_ids)
+        return categories.update(
+            active_project_count=Coalesce(Subquery(active), 0),
+            units_sold=Coalesce(Subquery(units), 0),
+        )
+    
     def get_image_url(self):
         """Get the category image URL - prioritize external URL over local file"""
         if self.image_url:
-            return Project.convert_google_drive_url(self.image_url)
+            return self.get_external_image_url()
         elif self.image:
-            return self.image.url
+            return self.get_derivative_url('display') or self.image.url
         return None
     
     def __str__(self):
         return self.name
 
 
-class Project(models.Model):
+class Project(ProcessedImageMixin, models.Model):
     DELIVERY_CHOICES = [
         ('download', 'Download Link'),
         ('email', 'Email Delivery'),
@@ -50,9 +213,10 @@ class Project(models.Model):
     tags = models.CharField(max_length=500, help_text="Comma-separated tags (e.g., Web, AI, ML)")
     
     # Images and videos
-    featured_image = models.ImageField(upload_to='projects/images/', blank=True, null=True)
+    featured_image = models.ImageField(upload_to='images/', storage=content_addressed_storage, blank=True, null=True)
     featured_image_url = models.URLField(blank=True, null=True, help_text="External image URL (e.g., Google Drive link)")
     demo_video_url = models.URLField(blank=True, help_text="YouTube or Vimeo URL")
+    embed_video_url = models.CharField(max_length=500, blank=True, editable=False)
     
     # Delivery
     delivery_type = models.CharField(max_length=10, choices=DELIVERY_CHOICES, default='download')
@@ -68,25 +232,42 @@ class Project(models.Model):
     # SEO
     meta_description = models.CharField(max_length=160, blank=True)
     
+    # Sales from paid orders, kept up to date by orders.Order.record_sales()
+    # (`manage.py rebuild_sales_counters` recomputes them)
+    units_sold = models.PositiveIntegerField(default=0, editable=False)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['is_active', '-created_at']),
             models.Index(fields=['category', '-created_at']),
+            models.Index(fields=['-units_sold']),
         ]
     
+    processed_image_field = 'featured_image'
+    external_image_field = 'featured_image_url'
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_listing = instance._listing()
+        return instance
+    
+    def _listing(self):
+        # (category_id, is_active) as counted in Category; None for deferred fields
+        return self.__dict__.get('category_id'), self.__dict__.get('is_active')
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        self.embed_video_url = self.convert_video_url(self.demo_video_url) if self.demo_video_url else ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'demo_video_url' in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'embed_video_url']
         super().save(*args, **kwargs)
-        
-        # Resize image if too large
-        if self.featured_image:
-            img = Image.open(self.featured_image.path)
-            if img.height > 800 or img.width > 800:
-                output_size = (800, 800)
-                img.thumbnail(output_size)
-                img.save(self.featured_image.path)
+        # After super().save(), which attaches the processed image once post_save has run
+        CatalogEntry.refresh([self.pk])
     
     def get_absolute_url(self):
         return reverse('project_detail', kwargs={'slug': self.slug})
@@ -94,12 +275,25 @@ class Project(models.Model):
     def get_tags_list(self):
         return [tag.strip() for tag in self.tags.split(',') if tag.strip()]
     
+    def get_related_projects(self, limit=4):
+        """Precomputed neighbors, falling back to recent products in the same category"""
+        links = self.related_links.filter(related__is_active=True).select_related('related')[:limit]
+        related = [link.related for link in links]
+        if related:
+            return related
+        # Not built yet for this product (new, or never bought and untagged)
+        return list(Project.objects.filter(category_id=self.category_id, is_active=True).exclude(pk=self.pk)[:limit])
+    
+    def get_cross_sells(self, limit=4):
+        """Products most often bought together with this one"""
+        return CoPurchase.recommend([self.pk], limit)
+    
     def get_featured_image_url(self):
         """Get the featured image URL - prioritize external URL over local file"""
         if self.featured_image_url:
-            return self.convert_google_drive_url(self.featured_image_url)
+            return self.get_external_image_url()
         elif self.featured_image:
-            return self.featured_image.url
+            return self.get_derivative_url('display') or self.featured_image.url
         return None
     
     @staticmethod
@@ -115,12 +309,14 @@ class Project(models.Model):
         return url
     
     def get_embed_video_url(self):
-        """Convert YouTube/Vimeo URL to embeddable format"""
+        """Embeddable YouTube/Vimeo URL for the demo video"""
         if not self.demo_video_url:
             return None
-        
-        url = self.demo_video_url
-        
+        return self.embed_video_url or self.convert_video_url(self.demo_video_url)
+    
+    @staticmethod
+    def convert_video_url(url):
+        """Convert YouTube/Vimeo URL to embeddable format"""
         # Convert YouTube URLs
         if 'youtube.com/watch' in url:
             try:
@@ -150,39 +346,406 @@ class Project(models.Model):
         return self.title
 
 
-class ProjectImage(models.Model):
+class ProjectImage(ProcessedImageMixin, models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='projects/gallery/', blank=True, null=True)
+    image = models.ImageField(upload_to='images/', storage=content_addressed_storage, blank=True, null=True)
     image_url = models.URLField(blank=True, null=True, help_text="External image URL (e.g., Google Drive link)")
     alt_text = models.CharField(max_length=200, blank=True)
     order = models.PositiveIntegerField(default=0)
     
+    processed_image_field = 'image'
+    external_image_field = 'image_url'
+    
     class Meta:
         ordering = ['order']
     
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        
-        # Resize image if too large
-        if self.image:
-            img = Image.open(self.image.path)
-            if img.height > 1200 or img.width > 1200:
-                output_size = (1200, 1200)
-                img.thumbnail(output_size)
-                img.save(self.image.path)
-    
     def get_image_url(self):
         """Get the image URL - prioritize external URL over local file"""
         if self.image_url:
-            return Project.convert_google_drive_url(self.image_url)
+            return self.get_external_image_url()
         elif self.image:
-            return self.image.url
+            return self.get_derivative_url('display') or self.image.url
         return None
     
     def __str__(self):
         return f"{self.project.title} - Image {self.order}"
 
 
+class RelatedProject(models.Model):
+    """A precomputed neighbor of a product, refreshed by `manage.py build_recommendations`"""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    
+    class Meta:
+        ordering = ['project', 'rank']
+        constraints = [
+            # Also the index the detail page reads through
+            models.UniqueConstraint(fields=['project', 'rank'], name='unique_related_project_rank'),
+        ]
+    
+    def __str__(self):
+        return f"{self.project_id} -> {self.related_id} (#{self.rank})"
+
+
+class SearchTrigram(models.Model):
+    """A trigram of a product's title or tags, for fuzzy search on databases without pg_trgm (projects.fuzzy)"""
+    trigram = models.CharField(max_length=3)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    
+    class Meta:
+        constraints = [
+            # Trigram first: lookups go from the query's trigrams to products
+            models.UniqueConstraint(fields=['trigram', 'project'], name='unique_search_trigram'),
+        ]
+    
+    def __str__(self):
+        return f"{self.trigram!r} {self.project_id}"
+
+
+class SearchLog(models.Model):
+    """One search from the search page, written in batches (projects.search_analytics)"""
+    query = models.CharField(max_length=200)
+    results = models.PositiveIntegerField()
+    latency_ms = models.PositiveIntegerField()
+    fuzzy = models.BooleanField(default=False)
+    # Set when the search happens, not when the buffered row is written
+    searched_at = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
+    
+    class Meta:
+        ordering = ['-searched_at']
+    
+    def __str__(self):
+        return f"{self.query!r}: {self.results} results"
+
+
+class SearchStat(models.Model):
+    """A day's searches for one query, rolled up from SearchLog by `manage.py rollup_searches`"""
+    date = models.DateField()
+    query = models.CharField(max_length=200)
+    searches = models.PositiveIntegerField(default=0)
+    zero_results = models.PositiveIntegerField(default=0)
+    fuzzy = models.PositiveIntegerField(default=0)
+    total_latency_ms = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-date', '-searches']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'query'], name='unique_search_stat'),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} {self.query!r}: {self.searches} searches"
+
+
+class PurchaseCount(models.Model):
+    """How many counted paid orders contained a product, for CoPurchase's lift and Jaccard"""
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    orders = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.project_id}: {self.orders} orders"
+
+
+class CoPurchase(models.Model):
+    """
+    How often two products were bought in the same order, kept for both
+    directions of the pair. Rows that pass the association thresholds get
+    a rank among the project's cross-sells. Built by `manage.py build_cross_sells`.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='co_purchases')
+    other = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField(default=0)
+    lift = models.FloatField(default=0)
+    jaccard = models.FloatField(default=0)
+    rank = models.PositiveSmallIntegerField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'other'], name='unique_co_purchase_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['project', 'rank']),
+        ]
+    
+    @classmethod
+    def recommend(cls, project_ids, limit=4):
+        """Active cross-sells for a set of products (one product's page, or a cart), best first"""
+        rows = (
+            cls.objects.filter(project_id__in=project_ids, rank__isnull=False, other__is_active=True)
+            .exclude(other_id__in=project_ids)
+            .select_related('other')
+            .order_by('rank', '-lift')
+        )
+        products = {}
+        for row in rows[:limit * len(project_ids)]:
+            products.setdefault(row.other_id, row.other)
+        return list(products.values())[:limit]
+    
+    def __str__(self):
+        return f"{self.project_id} + {self.other_id} ({self.orders} orders)"
+
+
+class CatalogEntry(models.Model):
+    """
+    An active product as the public listing pages show it, copied into one
+    row so home, list, category and search pages read a single table with
+    no joins. Products that aren't active have no entry.
+    
+    Kept current by Project.save(), the bulk product paths and image
+    processing; `manage.py build_catalog` rebuilds it and reassigns
+    sales_rank, which is otherwise left as of the last run.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='catalog_entry')
+    title = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=200)
+    description = models.TextField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    delivery_type = models.CharField(max_length=10)
+    # Comma-separated like Project.tags, with blanks dropped and spacing
+    # normalized, which can make it longer than Project.tags' 500 characters
+    tags = models.TextField(blank=True)
+    category_id = models.BigIntegerField()
+    category_name = models.CharField(max_length=100)
+    category_slug = models.SlugField(max_length=100)
+    image_url = models.TextField(blank=True)
+    # Derivative manifest of an uploaded image, once processed; empty otherwise
+    image_derivatives = models.JSONField(default=dict, blank=True)
+    # 1 for the best seller
+    sales_rank = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = "Catalog entries"
+        indexes = [
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['category_id', '-created_at']),
+            models.Index(fields=['sales_rank']),
+        ]
+    
+    @classmethod
+    def from_project(cls, project):
+        """Unsaved entry for a product loaded with its category"""
+        uploaded = project.image_status == 'ready' and not project.featured_image_url
+        return cls(
+            project_id=project.pk,
+            title=project.title,
+            slug=project.slug,
+            description=project.description,
+            price=project.price,
+            delivery_type=project.delivery_type,
+            tags=', '.join(project.get_tags_list()),
+            category_id=project.category_id,
+            category_name=project.category.name,
+            category_slug=project.category.slug,
+            image_url=project.get_featured_image_url() or '',
+            image_derivatives=project.image_derivatives if uploaded else {},
+            created_at=project.created_at,
+        )
+    
+    @classmethod
+    def refresh(cls, project_ids=None, batch_size=500):
+        """
+        Rewrite the entries of some products, or of all of them, dropping
+        those no longer active. Returns the number of entries written.
+        """
+        projects = Project.objects.filter(is_active=True).select_related('category').order_by('pk')
+        stale = cls.objects.filter(project__is_active=False)
+        if project_ids is not None:
+            project_ids = list(project_ids)
+            projects = projects.filter(pk__in=project_ids)
+            stale = stale.filter(project_id__in=project_ids)
+        stale.delete()
+    
+        update_fields = [field.name for field in cls._meta.concrete_fields if field.name not in ('project', 'sales_rank')]
+        written = 0
+        batch = []
+        for project in projects.iterator(chunk_size=batch_size):
+            batch.append(cls.from_project(project))
+            if len(batch) == batch_size:
+                cls.objects.bulk_create(batch, update_conflicts=True, unique_fields=['project'], update_fields=update_fields)
+                written += len(batch)
+                batch = []
+        cls.objects.bulk_create(batch, update_conflicts=True, unique_fields=['project'], update_fields=update_fields)
+        return written + len(batch)
+    
+    @classmethod
+    def rank(cls, batch_size=1000):
+        """Number entries by units sold, best first; returns how many ranks changed"""
+        order = Project.objects.filter(catalog_entry__isnull=False).order_by('-units_sold', '-created_at', 'pk')
+        ranks = {pk: position for position, pk in enumerate(order.values_list('pk', flat=True), start=1)}
+        changed = [
+            cls(project_id=pk, sales_rank=ranks[pk])
+            for pk, rank in cls.objects.values_list('pk', 'sales_rank')
+            if ranks.get(pk) != rank
+        ]
+        cls.objects.bulk_update(changed, ['sales_rank'], batch_size=batch_size)
+        return len(changed)
+    
+    def get_absolute_url(self):
+        return reverse('project_detail', kwargs={'slug': self.slug})
+    
+    def get_tags_list(self):
+        return self.tags.split(', ') if self.tags else []
+    
+    def get_featured_image_url(self):
+        return self.image_url or None
+    
+    # What templatetags.image_tags.responsive_image reads from a processed image
+    def get_placeholder(self):
+        return self.image_derivatives.get('placeholder')
+    
+    def get_srcsets(self):
+        return {
+            mime: ', '.join(f'{default_storage.url(path)} {width}w' for width, path in entries)
+            for mime, entries in self.image_derivatives.get('srcset', {}).items()
+        }
+    
+    def __str__(self):
+        return self.title
+
+
+class ImageAsset(models.Model):
+    """
+    One stored image file, shared by every Category, Project and ProjectImage
+    that uploaded the same bytes. Derivatives are generated once per asset
+    and the file is deleted when the last reference goes away.
+    
+    References are counted by ProcessedImageMixin.save() and the post_delete
+    receivers, so image fields must only change through save() and delete():
+    bulk_create(), update() and loaddata skip them (`manage.py process_images
+    --backfill` recounts every asset from the rows).
+    """
+    digest = models.CharField(max_length=64, unique=True, help_text="BLAKE2b digest of the file")
+    file = models.ImageField(upload_to='images/', storage=content_addressed_storage, max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    
+    status = models.CharField(max_length=10, choices=ProcessedImageMixin.IMAGE_STATUS_CHOICES, default='pending')
+    derivatives = models.JSONField(default=dict, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    @classmethod
+    def acquire(cls, field_file):
+        """Take a reference on the asset holding this file's bytes, creating it if needed"""
+        digest = digest_from_name(field_file.name) or file_digest(field_file)
+        with transaction.atomic():
+            while True:
+                asset, created = cls.objects.get_or_create(digest=digest, defaults={'file': field_file.name})
+                # Counting up and release()'s delete both lock the row; if a release
+                # deleted it since get_or_create, nothing was counted and it's recreated
+                if cls.objects.filter(pk=asset.pk).update(ref_count=F('ref_count') + 1):
+                    break
+            asset.ref_count += 1
+            if created:
+                ImageJob.enqueue(asset, 'file')
+            elif asset.file.name != field_file.name:
+                # A duplicate copy was written under a new name; the asset's copy wins
+                stored_name = field_file.name
+                transaction.on_commit(lambda: content_addressed_storage.delete(stored_name))
+        return asset
+    
+    @classmethod
+    def release(cls, name):
+        """Drop a reference; the last one removes the file and its derivatives"""
+        with transaction.atomic():
+            # Locked until commit, so a concurrent acquire() waits for the outcome
+            asset = cls.objects.select_for_update().filter(file=name).first()
+            if asset is None:
+                return
+            if asset.ref_count > 1:
+                cls.objects.filter(pk=asset.pk).update(ref_count=F('ref_count') - 1)
+                return
+            asset.delete()
+            transaction.on_commit(asset.delete_files)
+    
+    def delete_files(self):
+        # The same bytes may have been uploaded again since, under the same name
+        if ImageAsset.objects.filter(file=self.file.name).exists():
+            return
+        from .images import delete_derivatives
+        delete_derivatives(self.derivatives)
+        self.file.storage.delete(self.file.name)
+    
+    def __str__(self):
+        return f"{self.file.name} ({self.ref_count} refs)"
+
+
+class ExternalImage(ProcessedImageMixin, models.Model):
+    """
+    Local copy of an external image served by the image proxy (projects.proxy).
+
+    Registered on the first proxy request; the image worker fetches it into
+    `file`, which is then shared and processed like any other upload.
+    """
+    url_hash = models.CharField(max_length=64, unique=True)
+    source_url = models.TextField()
+    file = models.ImageField(upload_to='images/', storage=content_addressed_storage, max_length=255, blank=True)
+    fetched_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    processed_image_field = 'file'
+    
+    @classmethod
+    def register(cls, url):
+        """Get the record for an external URL, queueing the fetch the first time it's seen"""
+        image, created = cls.objects.get_or_create(
+            url_hash=url_hash(url),
+            defaults={'source_url': url, 'image_status': 'pending'},
+        )
+        if created:
+            ImageJob.enqueue(image, 'source_url')
+        return image
+    
+    def __str__(self):
+        return self.source_url
+
+
+class ImageJob(models.Model):
+    """Image work queued for an ImageAsset or ExternalImage, run by `manage.py process_images`"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    target = GenericForeignKey('content_type', 'object_id')
+    field_name = models.CharField(max_length=50)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    @classmethod
+    def enqueue(cls, instance, field_name):
+        """Queue processing for an image field, unless a job is already waiting"""
+        job, created = cls.objects.get_or_create(
+            content_type=ContentType.objects.get_for_model(instance),
+            object_id=instance.pk,
+            field_name=field_name,
+            status='pending',
+        )
+        return job
+    
+    def __str__(self):
+        return f"{self.content_type.model} {self.object_id}.{self.field_name} ({self.status})"
+
+
 class Cart(models.Model):
     session_key = models.CharField(max_length=40)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -213,3 +776,85 @@ class CartItem(models.Model):
     
     def __str__(self):
         return f"{self.project.title} x {self.quantity}"
+
+
+@receiver(post_save, sender=Project)
+def move_category_counters(sender, instance, created, raw=False, **kwargs):
+    """Update category counters when a product is added, (de)activated or recategorized"""
+    if raw:
+        return
+    previous = (None, False) if created else getattr(instance, '_loaded_listing', (None, None))
+    current = instance._listing()
+    instance._loaded_listing = current
+    if None in current or (not created and None in previous):
+        # Loaded with deferred fields, so what was counted before is unknown
+        categories = Project.objects.filter(pk=instance.pk).values_list('category_id', flat=True)
+        Category.recount_counters({previous[0], current[0], *categories} - {None})
+        return
+    
+    (old_category, was_active), (new_category, is_active) = previous, current
+    if old_category == new_category:
+        Category.adjust_counters(new_category, active_projects=is_active - was_active)
+    else:
+        units = instance.units_sold
+        Category.adjust_counters(old_category, active_projects=-was_active, units=-units)
+        Category.adjust_counters(new_category, active_projects=is_active, units=units)
+
+
+@receiver(post_save, sender=Project)
+def reindex_search_trigrams(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'title', 'tags'} & set(update_fields)):
+        return
+    from .fuzzy import index_projects
+    index_projects([instance.pk])
+
+
+@receiver(post_delete, sender=Project)
+def remove_from_category_counters(sender, instance, **kwargs):
+    category_id, is_active = instance._listing()
+    units = instance.__dict__.get('units_sold')
+    if is_active is None or units is None:
+        Category.recount_counters([category_id])
+    else:
+        Category.adjust_counters(category_id, active_projects=-is_active, units=-units)
+
+
+@receiver(products_changed)
+def recount_changed_categories(sender, product_ids, **kwargs):
+    # Bulk updates skip post_save; deleted products were handled by post_delete
+    Category.recount_counters(Project.objects.filter(pk__in=product_ids).values('category_id'))
+
+
+@receiver(products_changed)
+def refresh_changed_entries(sender, product_ids, **kwargs):
+    CatalogEntry.refresh(product_ids)
+
+
+@receiver(post_save, sender=Category)
+def rename_category_entries(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    CatalogEntry.objects.filter(category_id=instance.pk).exclude(
+        category_name=instance.name, category_slug=instance.slug,
+    ).update(category_name=instance.name, category_slug=instance.slug)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Project)
+@receiver(products_changed)
+def catalog_changed(sender, **kwargs):
+    """Invalidate per-process catalog caches such as the autocomplete index"""
+    bump_catalog_version()
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=ProjectImage)
+@receiver(post_delete, sender=ExternalImage)
+def release_image_asset(sender, instance, **kwargs):
+    """Release the shared image file when a row that uploaded it is deleted"""
+    name = getattr(instance, instance.processed_image_field).name
+    if name:
+        ImageAsset.release(name)
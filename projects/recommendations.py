@@ -0,0 +1,272 @@
+"""
+Related-product recommendations used by `manage.py build_recommendations`.
+
+Neighbors are scored offline from two sparse signals: how often two
+products were bought in the same paid order, and how many tags they share.
+Both are counted through inverted indexes (product -> orders, tag ->
+products), so only pairs that actually co-occur are ever visited. The top
+neighbors of each product are written to RelatedProject, and the detail
+page reads them back with one indexed query.
+
+`manage.py build_cross_sells` keeps running co-purchase counts instead.
+Each order's basket is counted once (Order.basket_counted), so a run only
+reads orders paid, or refunded, since the previous one. Lift and Jaccard
+are then rescored from the stored counts, and pairs passing the
+thresholds are ranked as the product's "customers also bought" list.
+"""
+from collections import Counter, defaultdict
+from itertools import combinations
+from math import sqrt
+
+from django.db import transaction
+
+from orders.models import Order, OrderItem
+
+from .models import CoPurchase, Project, PurchaseCount, RelatedProject
+
+
+# Weights of the cosine similarities in the final score. Co-purchases are
+# the stronger evidence; tags cover products nobody has bought yet
+COPURCHASE_WEIGHT = 0.6
+TAG_WEIGHT = 0.3
+# Added once for a neighbor in the same category, which also breaks ties
+CATEGORY_WEIGHT = 0.1
+
+# Tags on more products than this say little about any pair of them and
+# would make the pair count quadratic, so they are skipped
+MAX_TAG_PRODUCTS = 500
+
+# Orders with more distinct products than this are bulk purchases, not baskets
+MAX_BASKET_SIZE = 50
+
+
+def cosine_scores(groups):
+    """
+    Pairwise cosine similarity of items from their group memberships.
+
+    `groups` is an iterable of item sets (one per order, or one per tag);
+    returns {item: Counter({other item: similarity})}.
+    """
+    pairs = defaultdict(Counter)
+    sizes = Counter()
+    for members in groups:
+        members = sorted(members)
+        sizes.update(members)
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                pairs[a][b] += 1
+                pairs[b][a] += 1
+
+    scores = defaultdict(Counter)
+    for a, others in pairs.items():
+        for b, together in others.items():
+            scores[a][b] = together / sqrt(sizes[a] * sizes[b])
+    return scores
+
+
+def order_baskets():
+    """Sets of product ids bought together in each paid order"""
+    baskets = defaultdict(set)
+    items = OrderItem.objects.filter(order__payment_status='completed').values_list('order_id', 'project_id')
+    for order_id, project_id in items.iterator(chunk_size=5000):
+        baskets[order_id].add(project_id)
+    return (basket for basket in baskets.values() if 1 < len(basket) <= MAX_BASKET_SIZE)
+
+
+def tag_groups(tags_by_product):
+    """Sets of product ids sharing each tag"""
+    products_by_tag = defaultdict(set)
+    for project_id, tags in tags_by_product.items():
+        for tag in tags:
+            products_by_tag[tag].add(project_id)
+    return (ids for ids in products_by_tag.values() if 1 < len(ids) <= MAX_TAG_PRODUCTS)
+
+
+def compute_neighbors(limit):
+    """Return {project id: [(related id, score), ...]} with the top `limit` neighbors"""
+    products = {
+        pk: (category_id, {tag.strip().lower() for tag in tags.split(',') if tag.strip()})
+        for pk, category_id, tags in Project.objects.filter(is_active=True).values_list('pk', 'category_id', 'tags')
+    }
+    copurchases = cosine_scores(order_baskets())
+    shared_tags = cosine_scores(tag_groups({pk: tags for pk, (_, tags) in products.items()}))
+
+    neighbors = {}
+    for pk, (category_id, _) in products.items():
+        scores = Counter()
+        for other, similarity in copurchases.get(pk, {}).items():
+            scores[other] += COPURCHASE_WEIGHT * similarity
+        for other, similarity in shared_tags.get(pk, {}).items():
+            scores[other] += TAG_WEIGHT * similarity
+        # Neighbors must be active products; inactive ones can still appear in old orders
+        candidates = [
+            (other, score + (CATEGORY_WEIGHT if products[other][0] == category_id else 0))
+            for other, score in scores.items() if other in products
+        ]
+        candidates.sort(key=lambda pair: (-pair[1], pair[0]))
+        if candidates:
+            neighbors[pk] = candidates[:limit]
+    return neighbors
+
+
+@transaction.atomic
+def build_recommendations(limit, batch_size=1000):
+    """Replace the RelatedProject table; returns (products, neighbor rows)"""
+    neighbors = compute_neighbors(limit)
+    RelatedProject.objects.all().delete()
+    RelatedProject.objects.bulk_create(
+        (
+            RelatedProject(project_id=pk, related_id=other, rank=rank, score=score)
+            for pk, related in neighbors.items()
+            for rank, (other, score) in enumerate(related, 1)
+        ),
+        batch_size=batch_size,
+    )
+    return len(neighbors), sum(len(related) for related in neighbors.values())
+
+
+# Association thresholds for cross-sells: pairs bought together in fewer
+# orders than this are noise however high their lift
+MIN_SUPPORT = 2
+# Lift above 1 means bought together more often than chance
+MIN_LIFT = 1.0
+MIN_JACCARD = 0.01
+
+
+def count_baskets(order_ids):
+    """Per-product and per-pair (lower id first) basket counts of some orders"""
+    baskets = defaultdict(set)
+    for order_id, project_id in OrderItem.objects.filter(order_id__in=order_ids).values_list('order_id', 'project_id'):
+        baskets[order_id].add(project_id)
+
+    products, pairs = Counter(), Counter()
+    for basket in baskets.values():
+        products.update(basket)
+        if len(basket) <= MAX_BASKET_SIZE:
+            pairs.update(combinations(sorted(basket), 2))
+    return products, pairs
+
+
+def add_counts(products, pairs, sign):
+    """Add (or with sign=-1 subtract) basket counts to the stored ones"""
+    current = dict(PurchaseCount.objects.filter(project_id__in=products).values_list('project_id', 'orders'))
+    PurchaseCount.objects.bulk_create(
+        [
+            PurchaseCount(project_id=pk, orders=max(0, current.get(pk, 0) + sign * count))
+            for pk, count in products.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['project'],
+        update_fields=['orders'],
+    )
+
+    # Both directions of every pair; filtering on both sides bounds the read
+    # to rows among products in these baskets
+    deltas = Counter()
+    for (a, b), count in pairs.items():
+        deltas[a, b] = deltas[b, a] = sign * count
+    current = {
+        (a, b): orders
+        for a, b, orders in CoPurchase.objects.filter(project_id__in=products, other_id__in=products)
+        .values_list('project_id', 'other_id', 'orders')
+    }
+    CoPurchase.objects.bulk_create(
+        [
+            CoPurchase(project_id=a, other_id=b, orders=max(0, current.get((a, b), 0) + delta))
+            for (a, b), delta in deltas.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['project', 'other'],
+        update_fields=['orders'],
+        batch_size=1000,
+    )
+
+
+def count_new_orders(batch_size):
+    """
+    Fold orders paid or refunded since the last run into the counts.
+
+    Each batch flips Order.basket_counted in the same transaction as the
+    counts it adds, so an interrupted run never counts an order twice.
+    Returns (orders added, orders removed).
+    """
+    added = removed = 0
+    pending = (
+        (Order.objects.filter(payment_status='completed', basket_counted=False), 1),
+        # Refunded or otherwise no longer paid after being counted
+        (Order.objects.exclude(payment_status='completed').filter(basket_counted=True), -1),
+    )
+    for orders, sign in pending:
+        while True:
+            with transaction.atomic():
+                order_ids = list(orders.order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not order_ids:
+                    break
+                products, pairs = count_baskets(order_ids)
+                add_counts(products, pairs, sign)
+                Order.objects.filter(pk__in=order_ids).update(basket_counted=sign > 0)
+            if sign > 0:
+                added += len(order_ids)
+            else:
+                removed += len(order_ids)
+    return added, removed
+
+
+def rank_cross_sells(limit, min_support=MIN_SUPPORT, min_lift=MIN_LIFT, min_jaccard=MIN_JACCARD, batch_size=1000):
+    """
+    Rescore every pair from the stored counts and rank each product's best ones.
+
+    Reads only CoPurchase/PurchaseCount, never orders. Returns how many
+    pairs are ranked.
+    """
+    CoPurchase.objects.filter(orders=0).delete()
+    total = Order.objects.filter(basket_counted=True).count()
+    baskets = dict(PurchaseCount.objects.values_list('project_id', 'orders'))
+
+    def score(row):
+        n_a, n_b = baskets.get(row.project_id, 0), baskets.get(row.other_id, 0)
+        lift = row.orders * total / (n_a * n_b) if n_a and n_b else 0
+        jaccard = row.orders / (n_a + n_b - row.orders) if n_a + n_b > row.orders else 0
+        return round(lift, 6), round(jaccard, 6)
+
+    ranked = 0
+    changed = []
+
+    def rank_group(rows):
+        nonlocal ranked
+        scores = {row.other_id: score(row) for row in rows}
+        passing = [
+            row for row in rows
+            if row.orders >= min_support and scores[row.other_id][0] >= min_lift and scores[row.other_id][1] >= min_jaccard
+        ]
+        passing.sort(key=lambda row: (-scores[row.other_id][0], -row.orders, row.other_id))
+        ranks = {row.other_id: rank for rank, row in enumerate(passing[:limit], 1)}
+        ranked += len(ranks)
+        for row in rows:
+            new = (*scores[row.other_id], ranks.get(row.other_id))
+            if (row.lift, row.jaccard, row.rank) != new:
+                row.lift, row.jaccard, row.rank = new
+                changed.append(row)
+
+    group = []
+    rows = CoPurchase.objects.order_by('project_id', 'other_id').only('project_id', 'other_id', 'orders', 'lift', 'jaccard', 'rank')
+    for row in rows.iterator(chunk_size=batch_size):
+        if group and group[0].project_id != row.project_id:
+            rank_group(group)
+            group = []
+            if len(changed) >= batch_size:
+                CoPurchase.objects.bulk_update(changed, ['lift', 'jaccard', 'rank'], batch_size=batch_size)
+                changed = []
+        group.append(row)
+    if group:
+        rank_group(group)
+    CoPurchase.objects.bulk_update(changed, ['lift', 'jaccard', 'rank'], batch_size=batch_size)
+    return ranked
+
+
+def reset_cross_sells():
+    """Drop all co-purchase counts, so the next count starts from every paid order"""
+    with transaction.atomic():
+        CoPurchase.objects.all().delete()
+        PurchaseCount.objects.all().delete()
+        Order.objects.filter(basket_counted=True).update(basket_counted=False)
@@ -0,0 +1,73 @@
+"""
+Cached result sets for the project list and search.
+
+The ids a normalized query matches are cached under the catalog version
+(projects.signals), which any Project or Category write bumps, so a
+repeated query skips filtering and ranking and a page loads only its own
+rows. Facet counts (projects.facets) are cached the same way.
+"""
+import hashlib
+from collections.abc import Sequence
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+
+from .signals import catalog_version
+
+
+CACHE_TIMEOUT = 300
+
+# Larger result sets (e.g. the unfiltered list of a big catalog) aren't
+# cached; their pages are queried as usual
+MAX_CACHED_IDS = 1000
+
+_missing = object()
+
+
+def query_key(namespace, params, ignored=('page',)):
+    """Cache key for a query, the same whatever the order, case or spacing of its parameters"""
+    normalized = sorted(
+        (key, ' '.join(value.split()).lower())
+        for key, value in params.items()
+        if key not in ignored and value.strip()
+    )
+    digest = hashlib.sha256(urlencode(normalized).encode()).hexdigest()
+    return f'projects:{namespace}:{catalog_version()}:{digest}'
+
+
+def cached_result(namespace, params, compute, ignored=('page',)):
+    """compute()'s value for these query parameters, cached until the catalog changes"""
+    key = query_key(namespace, params, ignored)
+    value = cache.get(key, _missing)
+    if value is _missing:
+        value = compute()
+        cache.set(key, value, CACHE_TIMEOUT)
+    return value
+
+
+def result_ids(queryset):
+    """Primary keys of a result set in order, or None if there are too many to cache"""
+    ids = list(queryset.values_list('pk', flat=True)[:MAX_CACHED_IDS + 1])
+    return ids if len(ids) <= MAX_CACHED_IDS else None
+
+
+class CachedResults(Sequence):
+    """
+    A result set known by its ids, for Paginator: slicing out a page
+    loads just those rows from `queryset`, in the cached order.
+    """
+
+    def __init__(self, ids, queryset):
+        self.ids = ids
+        self.queryset = queryset
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self.queryset.get(pk=self.ids[index])
+        page_ids = self.ids[index]
+        rows = self.queryset.in_bulk(page_ids)
+        # A row deleted since caching just drops out of its page
+        return [rows[pk] for pk in page_ids if pk in rows]
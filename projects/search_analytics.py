@@ -0,0 +1,116 @@
+"""
+What people search for, and which searches find nothing.
+
+SearchView hands each search to an in-memory ring buffer that a background
+thread writes to SearchLog in batches (orders.buffers.BatchedWriter), so
+logging never adds an insert to the request. `manage.py rollup_searches`
+folds each day's log into SearchStat rows, one per query, and the admin
+report reads only those.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from orders.buffers import BatchedWriter
+
+from .models import SearchLog, SearchStat
+
+
+# Searches held in memory while the database catches up; beyond this the
+# oldest are dropped
+MAX_PENDING = 10000
+
+MAX_QUERY_LENGTH = SearchLog._meta.get_field('query').max_length
+
+search_logs = BatchedWriter(SearchLog, batch_size=200, flush_interval=10.0, max_pending=MAX_PENDING)
+
+
+def normalize_query(query):
+    """Lowercased with runs of whitespace collapsed, so spellings of one query count together"""
+    return ' '.join(query.casefold().split())[:MAX_QUERY_LENGTH]
+
+
+def record_search(query, results, latency_ms, fuzzy=False):
+    """Queue one search for logging; returns at once"""
+    query = normalize_query(query)
+    if query:
+        search_logs.add(SearchLog(query=query, results=results, latency_ms=round(latency_ms), fuzzy=fuzzy))
+
+
+def day_bounds(date):
+    start = timezone.make_aware(datetime.combine(date, time.min))
+    return start, start + timedelta(days=1)
+
+
+@transaction.atomic
+def rollup_searches(date):
+    """Replace the SearchStat rows of one day with counts from its SearchLog rows; returns the number written"""
+    start, end = day_bounds(date)
+    rows = (
+        SearchLog.objects.filter(searched_at__gte=start, searched_at__lt=end)
+        .values('query')
+        .annotate(
+            searches=Count('pk'),
+            zero_results=Count('pk', filter=Q(results=0)),
+            fuzzy_searches=Count('pk', filter=Q(fuzzy=True)),
+            total_latency_ms=Sum('latency_ms'),
+        )
+        .order_by()
+    )
+    SearchStat.objects.filter(date=date).delete()
+    stats = SearchStat.objects.bulk_create(
+        SearchStat(
+            date=date,
+            query=row['query'],
+            searches=row['searches'],
+            zero_results=row['zero_results'],
+            fuzzy=row['fuzzy_searches'],
+            total_latency_ms=row['total_latency_ms'],
+        )
+        for row in rows.iterator()
+    )
+    return len(stats)
+
+
+def prune_search_logs(keep_days):
+    """Delete SearchLog rows older than keep_days, once they've been rolled up"""
+    cutoff, _ = day_bounds(timezone.localdate() - timedelta(days=keep_days))
+    deleted, _ = SearchLog.objects.filter(searched_at__lt=cutoff).delete()
+    return deleted
+
+
+def search_report(days=7, limit=20):
+    """Top and zero-result queries over the last `days` rolled-up days"""
+    since = timezone.localdate() - timedelta(days=days)
+    recent = SearchStat.objects.filter(date__gte=since)
+    # Named apart from the SearchStat fields they sum
+    sums = {
+        'total_searches': Sum('searches'),
+        'total_zero_results': Sum('zero_results'),
+        'total_fuzzy': Sum('fuzzy'),
+        'total_latency': Sum('total_latency_ms'),
+    }
+    by_query = recent.values('query').annotate(**sums)
+
+    def summary(row):
+        searches = row['total_searches'] or 0
+        return {
+            'query': row.get('query'),
+            'searches': searches,
+            'zero_results': row['total_zero_results'] or 0,
+            'fuzzy': row['total_fuzzy'] or 0,
+            'zero_result_rate': (row['total_zero_results'] or 0) / searches if searches else 0,
+            'avg_latency_ms': (row['total_latency'] or 0) / searches if searches else 0,
+        }
+
+    return {
+        'since': since,
+        'totals': summary(recent.aggregate(**sums)),
+        'top_queries': [summary(row) for row in by_query.order_by('-total_searches', 'query')[:limit]],
+        'zero_result_queries': [
+            summary(row)
+            for row in by_query.filter(total_zero_results__gt=0).order_by('-total_zero_results', 'query')[:limit]
+        ],
+    }
@@ -0,0 +1,28 @@
+import uuid
+
+from django.core.cache import cache
+from django.dispatch import Signal
+
+
+# Sent after a bulk change to products, once per chunk rather than per row,
+# with product_ids (the affected primary keys) and action. Receivers drop
+# whatever they cache about those products.
+products_changed = Signal()
+
+
+CATALOG_VERSION_KEY = 'projects:catalog-version'
+
+
+def catalog_version():
+    """
+    Token that changes whenever products or categories change.
+
+    Kept in the shared cache (settings.CACHES), so every process sees a
+    change made by any of them.
+    """
+    return cache.get_or_set(CATALOG_VERSION_KEY, lambda: uuid.uuid4().hex, timeout=None)
+
+
+def bump_catalog_version():
+    """Invalidate everything derived from the catalog"""
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
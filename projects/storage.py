@@ -0,0 +1,52 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def file_digest(content):
+    """BLAKE2b hex digest of a Django File's bytes; leaves it at position 0"""
+    digest = hashlib.blake2b(digest_size=32)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def digest_from_name(name):
+    """The digest encoded in a content-addressed name, or None for other names"""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    if len(stem) == 64 and all(c in '0123456789abcdef' for c in stem):
+        return stem
+    return None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Media storage that names uploads after a digest of their bytes.
+
+    An upload to `images/photo.jpg` is stored as `images/ab/cd/<digest>.jpg`;
+    if that file already exists nothing is written, so identical images
+    uploaded to any model share one file. Sharing is tracked by ImageAsset.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = file_digest(content)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        name = os.path.join(directory, digest[:2], digest[2:4], f'{digest}{extension}')
+
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+content_addressed_storage = ContentAddressedStorage()
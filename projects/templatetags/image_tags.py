@@ -0,0 +1,41 @@
+from django import template
+
+
+register = template.Library()
+
+# Modern formats offered as <source>s, most efficient first
+SOURCE_TYPES = ['image/avif', 'image/webp']
+
+
+@register.inclusion_tag('projects/includes/responsive_image.html')
+def responsive_image(obj, src, alt='', sizes='100vw', css_class='', loading='lazy', onerror=''):
+    """
+    Render a processed image as a <picture> with AVIF/WebP sources and a
+    JPEG/PNG fallback, each with srcset/sizes so the browser fetches the
+    smallest adequate width.
+
+    Images without derivatives (external URLs, still processing) fall back to
+    a plain <img src>, still wrapped in <picture> so onerror handlers can
+    rely on the same markup: the element after the image is
+    this.parentNode.nextElementSibling.
+
+    Processed images also get their blurred placeholder as a background, so
+    lazily loaded cards have something to show before the real bytes arrive.
+    """
+    srcsets = obj.get_srcsets()
+    sources = [(mime, srcsets[mime]) for mime in SOURCE_TYPES if mime in srcsets]
+    fallback = next((srcset for mime, srcset in srcsets.items() if mime not in SOURCE_TYPES), '')
+    manifest = obj.image_derivatives if srcsets else {}
+    return {
+        'src': src,
+        'alt': alt,
+        'sizes': sizes,
+        'css_class': css_class,
+        'loading': loading,
+        'onerror': onerror,
+        'sources': sources,
+        'fallback_srcset': fallback,
+        'width': manifest.get('width'),
+        'height': manifest.get('height'),
+        'placeholder': obj.get_placeholder(),
+    }
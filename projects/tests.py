@@ -1,3 +1,803 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image as PILImage
+
+import scrape_devam
+from orders.buffers import BatchedWriter
+from orders.models import Order, OrderItem
+
+from .facets import count_facets
+from .fuzzy import fuzzy_search, index_projects
+from .images import output_formats, placeholder_data_uri
+from .models import (
+    CatalogEntry, Category, CoPurchase, ExternalImage, ImageAsset, ImageJob, Project, ProjectImage, PurchaseCount,
+    RelatedProject, SearchLog, SearchStat,
+)
+from .proxy import proxy_url, source_url
+from .recommendations import build_recommendations
+from .search_analytics import record_search, search_report
+from .storage import content_addressed_storage
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+def image_bytes(size, mode='RGB', format='PNG'):
+    data = io.BytesIO()
+    PILImage.new(mode, size, 'teal').save(data, format)
+    return data.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.category = Category.objects.create(name='IoT')
+
+    def new_project(self, **fields):
+        return Project(title='Weather Station', description='Kit', price=500, category=self.category,
+                       tags='iot', created_by=self.user, **fields)
+
+    def test_row_and_job_are_written_together(self):
+        project = self.new_project()
+        project.featured_image = ContentFile(b'not really a png', name='photo.png')
+        with mock.patch.object(ImageJob, 'enqueue', side_effect=DatabaseError('queue unavailable')):
+            with self.assertRaises(DatabaseError):
+                project.save()
+        self.assertFalse(Project.objects.exists())
+        self.assertFalse(ImageAsset.objects.exists())
+
+    def test_upload_queues_one_job(self):
+        project = self.new_project()
+        project.featured_image = ContentFile(b'not really a png', name='photo.png')
+        project.save()
+        asset = ImageAsset.objects.get()
+        self.assertEqual(asset.ref_count, 1)
+        self.assertEqual(ImageJob.objects.filter(object_id=asset.pk, status='pending').count(), 1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageAssetTests(TestCase):
+    def stored(self, data=b'shared bytes'):
+        name = content_addressed_storage.save('images/photo.png', ContentFile(data))
+        return ImageAsset(file=name).file
+
+    def test_last_release_deletes_row_and_file(self):
+        field_file = self.stored()
+        ImageAsset.acquire(field_file)
+        ImageAsset.acquire(field_file)
+        with self.captureOnCommitCallbacks(execute=True):
+            ImageAsset.release(field_file.name)
+        self.assertEqual(ImageAsset.objects.get().ref_count, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            ImageAsset.release(field_file.name)
+        self.assertFalse(ImageAsset.objects.exists())
+        self.assertFalse(content_addressed_storage.exists(field_file.name))
+
+    def test_acquire_racing_the_last_release_recreates_the_asset(self):
+        field_file = self.stored()
+        stale = ImageAsset.acquire(field_file)
+        get_or_create = ImageAsset.objects.get_or_create
+
+        def released_meanwhile(**kwargs):
+            # The row is found, then a concurrent release() deletes it before it's counted
+            if ImageAsset.objects.filter(pk=stale.pk).exists():
+                ImageAsset.objects.filter(pk=stale.pk).delete()
+                return stale, False
+            return get_or_create(**kwargs)
+
+        with mock.patch.object(ImageAsset.objects, 'get_or_create', side_effect=released_meanwhile):
+            acquired = ImageAsset.acquire(field_file)
+        self.assertNotEqual(acquired.pk, stale.pk)
+        self.assertEqual(ImageAsset.objects.get().ref_count, 1)
+
+    def test_file_kept_when_uploaded_again_before_commit(self):
+        field_file = self.stored()
+        ImageAsset.acquire(field_file)
+        with self.captureOnCommitCallbacks(execute=True):
+            ImageAsset.release(field_file.name)
+            ImageAsset.acquire(field_file)
+        self.assertEqual(ImageAsset.objects.get().ref_count, 1)
+        self.assertTrue(content_addressed_storage.exists(field_file.name))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DerivativeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.category = Category.objects.create(name='IoT')
+
+    def processed(self, size, mode='RGB'):
+        project = Project.objects.create(
+            title=f'Kit {size[0]}x{size[1]} {mode}', description='Kit', price=500, category=self.category, tags='iot',
+            created_by=self.user, featured_image=ContentFile(image_bytes(size, mode), name='photo.png'),
+        )
+        call_command('process_images', '--once', stdout=io.StringIO())
+        project.refresh_from_db()
+        self.assertEqual(project.image_status, 'ready')
+        return project
+
+    def test_widths_and_formats(self):
+        manifest = self.processed((1000, 500)).image_derivatives
+        modern = [mime for mime, *rest in output_formats(has_alpha=False)[:-1]]
+        self.assertEqual(list(manifest['srcset']), modern + ['image/jpeg'])
+        for mime, entries in manifest['srcset'].items():
+            # Widths above the source's own are never rendered
+            self.assertEqual([width for width, path in entries], [320, 480, 800, 1000])
+            self.assertTrue(all(default_storage.exists(path) for width, path in entries))
+        self.assertEqual((manifest['width'], manifest['height']), (1000, 500))
+        self.assertEqual(manifest['display'], manifest['srcset']['image/jpeg'][-1][1])
+        with default_storage.open(manifest['display']) as display:
+            self.assertEqual(PILImage.open(display).size, (1000, 500))
+
+    def test_portrait_bounded_by_its_height(self):
+        manifest = self.processed((600, 1600)).image_derivatives
+        self.assertEqual([width for width, path in manifest['srcset']['image/jpeg']], [320, 450])
+        self.assertEqual((manifest['width'], manifest['height']), (450, 1200))
+
+    def test_transparent_image_falls_back_to_png(self):
+        manifest = self.processed((200, 200), 'RGBA').image_derivatives
+        self.assertIn('image/png', manifest['srcset'])
+        self.assertNotIn('image/jpeg', manifest['srcset'])
+        self.assertTrue(manifest['display'].endswith('.png'))
+
+    def test_responsive_image_renders_srcsets(self):
+        project = self.processed((1000, 500))
+        html = Template('{% load image_tags %}{% responsive_image project src alt="Kit" sizes="50vw" %}').render(
+            Context({'project': project, 'src': project.get_featured_image_url()})
+        )
+        srcsets = project.get_srcsets()
+        self.assertIn(f'<source type="image/webp" srcset="{srcsets["image/webp"]}" sizes="50vw">', html)
+        self.assertIn(f'srcset="{srcsets["image/jpeg"]}" sizes="50vw" width="1000" height="500"', html)
+        self.assertIn(' 320w, ', srcsets['image/jpeg'])
+        self.assertIn(f'src="{default_storage.url(project.image_derivatives["display"])}"', html)
+
+    def test_unprocessed_image_is_a_plain_img(self):
+        project = Project.objects.create(
+            title='Pending Kit', description='Kit', price=500, category=self.category, tags='iot',
+            created_by=self.user, featured_image=ContentFile(image_bytes((100, 100)), name='photo.png'),
+        )
+        html = Template('{% load image_tags %}{% responsive_image project "/media/photo.png" %}').render(
+            Context({'project': project})
+        )
+        self.assertNotIn('<source', html)
+        self.assertNotIn('srcset', html)
+        self.assertIn('src="/media/photo.png"', html)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class PlaceholderTests(TestCase):
+    def decode(self, uri):
+        header, data = uri.split(',', 1)
+        return header, PILImage.open(io.BytesIO(base64.b64decode(data)))
+
+    def test_placeholder_is_a_tiny_inline_image(self):
+        uri = placeholder_data_uri(PILImage.new('RGB', (1000, 500), 'teal'), has_alpha=False)
+        header, tiny = self.decode(uri)
+        self.assertEqual(header, 'data:image/webp;base64')
+        self.assertEqual(tiny.size, (16, 8))
+        self.assertLess(len(uri), 1000)
+
+    def test_jpeg_placeholder_without_webp(self):
+        with mock.patch('projects.images.features.check', return_value=False):
+            uri = placeholder_data_uri(PILImage.new('RGBA', (50, 100), 'teal'), has_alpha=True)
+        header, tiny = self.decode(uri)
+        self.assertEqual((header, tiny.format, tiny.size), ('data:image/jpeg;base64', 'JPEG', (8, 16)))
+
+    def test_processed_image_renders_its_placeholder(self):
+        user = User.objects.create_user('owner')
+        project = Project.objects.create(
+            title='Weather Station', description='Kit', price=500, category=Category.objects.create(name='IoT'),
+            tags='iot', created_by=user, featured_image=ContentFile(image_bytes((400, 300)), name='photo.png'),
+        )
+        self.assertIsNone(project.get_placeholder())
+        call_command('process_images', '--once', stdout=io.StringIO())
+        project.refresh_from_db()
+        placeholder = project.get_placeholder()
+        self.assertTrue(placeholder.startswith('data:image/'))
+        entry = CatalogEntry.objects.get(pk=project.pk)
+        self.assertEqual(entry.get_placeholder(), placeholder)
+        html = Template('{% load image_tags %}{% responsive_image entry entry.get_featured_image_url %}').render(
+            Context({'entry': entry})
+        )
+        self.assertIn(f'style="background: url({placeholder}) center / cover no-repeat;"', html)
+
+        # An external URL takes over the display, so the upload's placeholder doesn't apply
+        project.featured_image_url = 'https://example.com/kit.jpg'
+        project.save()
+        self.assertIsNone(project.get_placeholder())
+
+
+class ResolvedUrlTests(TestCase):
+    drive_url = 'https://drive.google.com/file/d/abc123/view?usp=sharing'
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.category = Category.objects.create(name='IoT')
+
+    def stored(self, model, pk, *fields):
+        return model.objects.filter(pk=pk).values_list(*fields).get()
+
+    def test_urls_resolved_on_save(self):
+        project = Project.objects.create(
+            title='Weather Station', description='Kit', price=500, category=self.category, tags='iot',
+            created_by=self.user, featured_image_url=self.drive_url, demo_video_url='https://youtu.be/dQw4w9WgXcQ?t=5',
+        )
+        self.assertEqual(
+            self.stored(Project, project.pk, 'resolved_image_url', 'embed_video_url'),
+            ('https://lh3.googleusercontent.com/d/abc123=w800', 'https://www.youtube.com/embed/dQw4w9WgXcQ'),
+        )
+        image = ProjectImage.objects.create(project=project, image_url=self.drive_url)
+        self.assertEqual(self.stored(ProjectImage, image.pk, 'resolved_image_url'),
+                         ('https://lh3.googleusercontent.com/d/abc123=w800',))
+
+    def test_update_fields_carry_the_resolved_urls(self):
+        project = Project.objects.create(
+            title='Weather Station', description='Kit', price=500, category=self.category, tags='iot',
+            created_by=self.user,
+        )
+        project.featured_image_url = 'https://example.com/kit.jpg'
+        project.demo_video_url = 'https://vimeo.com/76979871'
+        project.save(update_fields=['featured_image_url', 'demo_video_url'])
+        self.assertEqual(
+            self.stored(Project, project.pk, 'resolved_image_url', 'embed_video_url'),
+            ('https://example.com/kit.jpg', 'https://player.vimeo.com/video/76979871'),
+        )
+
+        project.demo_video_url = ''
+        project.save(update_fields=['demo_video_url'])
+        self.assertEqual(self.stored(Project, project.pk, 'embed_video_url'), ('',))
+        self.assertIsNone(project.get_embed_video_url())
+
+    @override_settings(IMAGE_PROXY_ENABLED=True)
+    def test_proxied_url_signs_the_source(self):
+        category = Category.objects.create(name='Robotics', image_url=self.drive_url)
+        resolved = Category.objects.get(pk=category.pk).resolved_image_url
+        self.assertEqual(source_url(resolved.rstrip('/').rsplit('/', 1)[1]), self.drive_url)
+        self.assertEqual(category.get_external_image_url(), resolved)
+
+
+class BulkProductActionTests(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user('admin', is_staff=True)
+        self.project = Project.objects.create(
+            title='Weather Station', description='Kit', price=500, category=Category.objects.create(name='IoT'),
+            tags='iot', created_by=admin,
+        )
+        self.url = reverse('admin_panel:bulk_product_action')
+        self.client.force_login(admin)
+
+    def post(self, **data):
+        response = self.client.post(self.url, data, follow=True)
+        self.project.refresh_from_db()
+        return [str(message) for message in response.context['messages']]
+
+    def test_non_integer_selection_is_reported(self):
+        messages = self.post(action='deactivate', product_ids=[self.project.pk, 'abc'])
+        self.assertEqual(messages, ['Invalid product selection.'])
+        self.assertTrue(self.project.is_active)
+
+    def test_non_finite_amount_is_rejected(self):
+        for amount in ('NaN', 'Infinity', '-Infinity', 'sNaN'):
+            messages = self.post(action='reprice', price_mode='percent', amount=amount, product_ids=[self.project.pk])
+            self.assertEqual(messages, ['Enter a valid price or percentage.'])
+        self.assertEqual(self.project.price, 500)
+
+    def test_reprice_by_percentage(self):
+        messages = self.post(action='reprice', price_mode='percent', amount='-10', product_ids=[self.project.pk])
+        self.assertEqual(messages, ['1 products repriced.'])
+        self.assertEqual(self.project.price, 450)
+
+    def test_reprice_beyond_the_price_column_is_rejected(self):
+        for mode, amount in (('set', '100000000'), ('percent', '20000000')):
+            messages = self.post(action='reprice', price_mode=mode, amount=amount, product_ids=[self.project.pk])
+            self.assertEqual(messages, ['Prices can be at most ₹99,999,999.99.'])
+        self.assertEqual(self.project.price, 500)
+
+        messages = self.post(action='reprice', price_mode='set', amount='99999999.99', product_ids=[self.project.pk])
+        self.assertEqual(messages, ['1 products repriced.'])
+        self.assertEqual(self.project.price, Decimal('99999999.99'))
+
+    def test_filter_scope_acts_on_every_matching_product(self):
+        iot = self.project.category
+        robotics = Category.objects.create(name='Robotics')
+        owner = self.project.created_by
+        station = Project.objects.create(title='Weather Station Pro', description='Kit', price=900, category=iot,
+                                         tags='iot', created_by=owner)
+        rover = Project.objects.create(title='Weather Rover', description='Kit', price=900, category=robotics,
+                                       tags='robot', created_by=owner)
+        dimmer = Project.objects.create(title='Smart Dimmer', description='Kit', price=900, category=iot,
+                                        tags='iot', created_by=owner)
+        messages = self.post(action='deactivate', scope='filter', category=iot.pk, status='active', search='weather',
+                             product_ids=[dimmer.pk])
+        self.assertEqual(messages, ['2 products deactivated.'])
+        self.assertEqual(set(Project.objects.filter(is_active=False).values_list('pk', flat=True)),
+                         {self.project.pk, station.pk})
+        self.assertFalse(CatalogEntry.objects.filter(pk__in=[self.project.pk, station.pk]).exists())
+        self.assertTrue(CatalogEntry.objects.filter(pk__in=[rover.pk, dimmer.pk]).exists())
+
+
+class AdminCategoryListTests(TestCase):
+    def test_delete_offered_only_without_products(self):
+        admin = User.objects.create_user('admin', is_staff=True)
+        empty = Category.objects.create(name='Empty')
+        inactive_only = Category.objects.create(name='Retired')
+        Project.objects.create(title='Old Kit', description='Kit', price=500, category=inactive_only, tags='iot',
+                               created_by=admin, is_active=False)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin_panel:category_list'))
+        self.assertContains(response, f'deleteCategory({empty.pk},')
+        self.assertNotContains(response, f'deleteCategory({inactive_only.pk},')
+
+
+class FacetTests(TestCase):
+    def test_counts_by_facet_in_two_queries(self):
+        user = User.objects.create_user('owner')
+        iot = Category.objects.create(name='IoT')
+        for title, price, tags in [('Weather Station', 400, 'iot, Sensors'), ('Smart Plug', 1500, 'IoT, relay'),
+                                   ('Door Bell', 1800, 'iot,sensors')]:
+            Project.objects.create(title=title, description='Kit', price=price, category=iot, tags=tags,
+                                   created_by=user)
+        with self.assertNumQueries(2):
+            counts = count_facets(CatalogEntry.objects.all())
+        self.assertEqual(counts['total'], 3)
+        self.assertEqual(counts['category'], [(iot.slug, 'IoT', 3)])
+        self.assertEqual(counts['price'], [('under-500', 'Under ₹500', 1), ('500-2000', '₹500 – ₹2,000', 2)])
+        # Tags match case-insensitively; the label is whichever spelling came first
+        self.assertEqual([(tag.lower(), count) for tag, label, count in counts['tag']],
+                         [('iot', 3), ('sensors', 2), ('relay', 1)])
+
+
+class FuzzySearchTests(TestCase):
+    def test_candidates_limited_to_the_queryset_before_the_cut(self):
+        user = User.objects.create_user('owner')
+        iot = Category.objects.create(name='IoT')
+        hidden = [Project.objects.create(title=f'Djnago Starter {n}', description='Kit', price=500, category=iot,
+                                         tags='web', created_by=user, is_active=False) for n in range(3)]
+        shown = Project.objects.create(title='Django Blog', description='Kit', price=500, category=iot,
+                                       tags='web', created_by=user)
+        index_projects()
+        with mock.patch('projects.fuzzy.MAX_CANDIDATES', 2):
+            ids = fuzzy_search(Project.objects.filter(is_active=True), 'djnago')
+        self.assertEqual(ids, [shown.pk])
+        self.assertNotIn(hidden[0].pk, ids)
+
+
+class CachedResultsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_products_deactivated_since_caching_drop_out(self):
+        user = User.objects.create_user('owner')
+        iot = Category.objects.create(name='IoT')
+        kept, hidden = [Project.objects.create(title=title, description='Kit', price=500, category=iot, tags='iot',
+                                               created_by=user) for title in ('Weather Station', 'Smart Plug')]
+        for max_cached in (1000, 0):
+            with self.subTest(cached=bool(max_cached)), mock.patch('projects.result_cache.MAX_CACHED_IDS', max_cached):
+                cache.clear()
+                response = self.client.get(reverse('project_list'))
+                self.assertEqual([entry.pk for entry in response.context['projects']], [hidden.pk, kept.pk])
+
+                # As another process deactivating it would, before this one sees the new catalog version
+                with mock.patch('projects.models.bump_catalog_version'):
+                    hidden.is_active = False
+                    hidden.save()
+                response = self.client.get(reverse('project_list'))
+                self.assertEqual([entry.pk for entry in response.context['projects']], [kept.pk])
+
+                hidden.is_active = True
+                hidden.save()
+
+    @mock.patch('projects.search_analytics.search_logs')
+    def test_facet_counts_are_cached_per_view(self, search_logs):
+        user = User.objects.create_user('owner')
+        iot = Category.objects.create(name='IoT')
+        for title in ('Django Dashboard', 'Weather Station'):
+            Project.objects.create(title=title, description='Kit', price=500, category=iot, tags='iot',
+                                   created_by=user)
+        # The list view has no text search, so q leaves its results unfiltered
+        response = self.client.get(reverse('project_list'), {'q': 'django'})
+        self.assertEqual(response.context['facets']['total'], 2)
+        response = self.client.get(reverse('search'), {'q': 'django'})
+        self.assertEqual(response.context['facets']['total'], 1)
+        self.assertEqual(response.context['paginator'].count, 1)
+
+
+class SearchAnalyticsTests(TestCase):
+    def log(self, query, results, when, latency_ms=10, fuzzy=False):
+        SearchLog.objects.create(query=query, results=results, latency_ms=latency_ms, fuzzy=fuzzy, searched_at=when)
+
+    @mock.patch('projects.search_analytics.search_logs')
+    def test_record_search_queues_normalized_query(self, search_logs):
+        record_search('  Django   REST ', 3, 12.4, fuzzy=True)
+        record_search('   ', 0, 1)
+        log = search_logs.add.call_args.args[0]
+        self.assertEqual((log.query, log.results, log.latency_ms, log.fuzzy), ('django rest', 3, 12, True))
+        search_logs.add.assert_called_once()
+
+    @mock.patch('projects.search_analytics.search_logs')
+    def test_search_logged_on_first_page_only(self, search_logs):
+        user = User.objects.create_user('owner')
+        iot = Category.objects.create(name='IoT')
+        for n in range(13):
+            Project.objects.create(title=f'Sensor Kit {n}', description='Kit', price=500, category=iot, tags='iot',
+                                   created_by=user)
+        self.client.get(reverse('search'), {'q': 'Sensor'})
+        self.client.get(reverse('search'), {'q': 'Sensor', 'page': 2})
+        log = search_logs.add.call_args.args[0]
+        self.assertEqual((log.query, log.results), ('sensor', 13))
+        search_logs.add.assert_called_once()
+
+    def test_rollup_replaces_the_day_and_prunes(self):
+        day = timezone.localdate() - timedelta(days=1)
+        noon = timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=12)
+        self.log('django', 4, noon, latency_ms=20)
+        self.log('django', 0, noon, latency_ms=40, fuzzy=True)
+        self.log('arduino', 2, noon + timedelta(days=1))
+        self.log('old', 1, noon - timedelta(days=40))
+
+        out = io.StringIO()
+        call_command('rollup_searches', stdout=out)
+        call_command('rollup_searches', stdout=out)
+        stat = SearchStat.objects.get()
+        self.assertEqual((stat.date, stat.query, stat.searches, stat.zero_results, stat.fuzzy, stat.total_latency_ms),
+                         (day, 'django', 2, 1, 1, 60))
+        self.assertIn('pruned 1 old log rows', out.getvalue())
+        self.assertEqual(SearchLog.objects.count(), 3)
+
+    def test_report_totals_and_zero_result_queries(self):
+        today = timezone.localdate()
+        SearchStat.objects.create(date=today - timedelta(days=1), query='django', searches=6, zero_results=0,
+                                  total_latency_ms=60)
+        SearchStat.objects.create(date=today - timedelta(days=2), query='rasberry', searches=3, zero_results=3,
+                                  fuzzy=3, total_latency_ms=30)
+        SearchStat.objects.create(date=today - timedelta(days=20), query='stale', searches=50)
+
+        report = search_report(days=7)
+        self.assertEqual(report['totals']['searches'], 9)
+        self.assertAlmostEqual(report['totals']['zero_result_rate'], 1 / 3)
+        self.assertEqual(report['totals']['avg_latency_ms'], 10)
+        self.assertEqual([row['query'] for row in report['top_queries']], ['django', 'rasberry'])
+        self.assertEqual([(row['query'], row['zero_results']) for row in report['zero_result_queries']],
+                         [('rasberry', 3)])
+
+    def test_discarded_rows_are_never_written(self):
+        writer = BatchedWriter(SearchLog, flush_interval=60)
+        writer.add(SearchLog(query='django', results=1, latency_ms=5))
+        self.assertEqual(writer.discard(), 1)
+        writer.flush()
+        self.assertFalse(SearchLog.objects.exists())
+
+
+class ImportCatalogTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser('admin')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'catalog.csv')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(
+                'title,category,price\n'
+                'Weather Station,IoT,499.00\n'
+                'Broken Kit,IoT,NaN\n'
+                'Endless Kit,IoT,Infinity\n'
+                'Gold Kit,IoT,100000000\n'
+                'Fine Kit,IoT,1.005\n'
+            )
+
+    def run_import(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_catalog', self.path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_bad_prices_are_row_errors(self):
+        out, err = self.run_import()
+        self.assertIn('Imported 1 projects (1 new, 0 updated, 4 invalid)', out)
+        self.assertIn("Row 3: invalid price 'NaN'", err)
+        self.assertIn("Row 4: invalid price 'Infinity'", err)
+        self.assertIn("Row 5: price '100000000' has more than 8 digits before the point", err)
+        self.assertIn("Row 6: invalid price '1.005'", err)
+        self.assertEqual(list(Project.objects.values_list('title', 'price')), [('Weather Station', 499)])
+
+    def test_dry_run_reports_valid_rows_and_writes_nothing(self):
+        out, err = self.run_import('--dry-run')
+        self.assertIn('Dry run: 1 valid rows, 4 invalid, nothing written', out)
+        self.assertFalse(Project.objects.exists())
+        self.assertFalse(Category.objects.exists())
+
+    def test_unknown_owner_is_refused(self):
+        with self.assertRaisesMessage(CommandError, "No user named 'nobody' for --owner"):
+            self.run_import('--owner', 'nobody')
+        self.assertFalse(Project.objects.exists())
+
+
+class CatalogEntryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.category = Category.objects.create(name='IoT')
+
+    def test_resolve_urls_refreshes_entry_image(self):
+        project = Project.objects.create(
+            title='Weather Station', description='Kit', price=500, category=self.category, tags='iot',
+            created_by=self.user, featured_image_url='https://example.com/kit.jpg',
+        )
+        self.assertEqual(CatalogEntry.objects.get(pk=project.pk).image_url, 'https://example.com/kit.jpg')
+        with override_settings(IMAGE_PROXY_ENABLED=True):
+            call_command('resolve_urls', stdout=io.StringIO())
+        project.refresh_from_db()
+        self.assertIn('/images/proxy/', project.resolved_image_url)
+        self.assertEqual(CatalogEntry.objects.get(pk=project.pk).image_url, project.resolved_image_url)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer')
+        self.iot = Category.objects.create(name='IoT')
+        self.station = self.new_project('Weather Station', 'iot, sensor')
+        self.plug = self.new_project('Smart Plug', 'iot')
+        self.kit = self.new_project('Starter Kit', 'kit')
+        self.probe = self.new_project('Soil Probe', 'sensor', category=Category.objects.create(name='Farming'))
+        self.old = self.new_project('Old Hub', 'iot', is_active=False)
+        for basket in ((self.station, self.plug), (self.station, self.plug), (self.station, self.kit),
+                       (self.station, self.old)):
+            self.new_order(*basket)
+        # Unpaid, so it must not make the probe a co-purchase of the station
+        self.new_order(self.station, self.probe, payment_status='pending')
+
+    def new_project(self, title, tags, category=None, **fields):
+        return Project.objects.create(title=title, description='Kit', price=500, category=category or self.iot,
+                                      tags=tags, created_by=self.user, **fields)
+
+    def new_order(self, *projects, payment_status='completed'):
+        order = Order.objects.create(user=self.user, total_amount=0, customer_name='Buyer',
+                                     customer_email='buyer@example.com', payment_status=payment_status)
+        for project in projects:
+            OrderItem.objects.create(order=order, project=project, project_title=project.title,
+                                     project_price=project.price)
+        return order
+
+    def related(self, project):
+        return list(RelatedProject.objects.filter(project=project).values_list('related__title', flat=True))
+
+    def test_neighbors_are_ranked_by_copurchases_tags_and_category(self):
+        self.assertEqual(build_recommendations(limit=8), (4, 6))
+        self.assertEqual(self.related(self.station), ['Smart Plug', 'Starter Kit', 'Soil Probe'])
+        self.assertEqual(self.related(self.probe), ['Weather Station'])
+        self.assertEqual(self.station.get_related_projects(), [self.plug, self.kit, self.probe])
+
+    def test_limit_and_inactive_products(self):
+        self.assertEqual(build_recommendations(limit=2), (4, 5))
+        self.assertEqual(self.related(self.station), ['Smart Plug', 'Starter Kit'])
+        self.assertFalse(RelatedProject.objects.filter(project=self.old).exists())
+        self.assertFalse(RelatedProject.objects.filter(related=self.old).exists())
+
+    def test_rebuild_replaces_previous_rows(self):
+        build_recommendations(limit=8)
+        self.kit.is_active = False
+        self.kit.save()
+        out = io.StringIO()
+        call_command('build_recommendations', '--limit', '8', stdout=out)
+        self.assertIn('Stored 4 related products for 3 products', out.getvalue())
+        self.assertEqual(self.related(self.station), ['Smart Plug', 'Soil Probe'])
+        self.assertFalse(RelatedProject.objects.filter(related=self.kit).exists())
+
+
+class CrossSellTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer')
+        self.iot = Category.objects.create(name='IoT')
+        self.station, self.plug, self.kit, self.probe = (
+            Project.objects.create(title=title, description='Kit', price=500, category=self.iot, tags='iot',
+                                   created_by=self.user)
+            for title in ('Weather Station', 'Smart Plug', 'Starter Kit', 'Soil Probe')
+        )
+        self.orders = [
+            self.new_order(*basket) for basket in (
+                (self.station, self.plug), (self.station, self.plug), (self.station, self.plug),
+                (self.station, self.kit), (self.kit, self.probe), (self.kit, self.probe),
+            )
+        ]
+
+    def new_order(self, *projects):
+        order = Order.objects.create(user=self.user, total_amount=0, customer_name='Buyer',
+                                     customer_email='buyer@example.com', payment_status='completed')
+        for project in projects:
+            OrderItem.objects.create(order=order, project=project, project_title=project.title,
+                                     project_price=project.price)
+        return order
+
+    def build(self, *args):
+        out = io.StringIO()
+        call_command('build_cross_sells', *args, stdout=out)
+        return out.getvalue()
+
+    def pair(self, project, other):
+        row = CoPurchase.objects.get(project=project, other=other)
+        return row.orders, row.lift, row.jaccard, row.rank
+
+    def test_pairs_are_scored_and_ranked_above_the_thresholds(self):
+        out = self.build()
+        self.assertIn('Counted 6 new orders, removed 0 refunded', out)
+        self.assertIn('Ranked 4 cross-sells', out)
+        self.assertEqual(self.pair(self.station, self.plug), (3, 1.5, 0.75, 1))
+        self.assertEqual(self.pair(self.plug, self.station), (3, 1.5, 0.75, 1))
+        self.assertEqual(self.pair(self.kit, self.probe), (2, 2.0, 0.666667, 1))
+        # Bought together once: below MIN_SUPPORT, so counted but not ranked
+        self.assertEqual(self.pair(self.station, self.kit)[::3], (1, None))
+        self.assertEqual(self.station.get_cross_sells(), [self.plug])
+        self.assertEqual(self.kit.get_cross_sells(), [self.probe])
+
+    def test_runs_count_only_new_and_refunded_orders(self):
+        self.build()
+        self.assertIn('Counted 0 new orders, removed 0 refunded', self.build())
+
+        self.new_order(self.station, self.kit)
+        refunded = self.orders[0]
+        refunded.payment_status = 'refunded'
+        refunded.save()
+        self.assertIn('Counted 1 new orders, removed 1 refunded', self.build())
+        self.assertFalse(Order.objects.get(pk=refunded.pk).basket_counted)
+        self.assertEqual(PurchaseCount.objects.get(project=self.station).orders, 4)
+        self.assertEqual(self.pair(self.station, self.plug), (2, 1.5, 0.5, 1))
+        # Now bought together twice, but no more often than chance
+        self.assertEqual(self.pair(self.station, self.kit), (2, 0.75, 0.333333, None))
+
+    def test_full_recounts_every_paid_order(self):
+        self.build()
+        PurchaseCount.objects.filter(project=self.station).update(orders=40)
+        CoPurchase.objects.filter(project=self.station, other=self.plug).update(orders=0)
+        self.assertIn('Counted 6 new orders', self.build('--full'))
+        self.assertEqual(PurchaseCount.objects.get(project=self.station).orders, 4)
+        self.assertEqual(self.pair(self.station, self.plug), (3, 1.5, 0.75, 1))
+
+    def test_recommend_for_a_cart(self):
+        self.build()
+        # Best rank first, then highest lift; products already in the cart are left out
+        self.assertEqual(CoPurchase.recommend([self.station, self.kit]), [self.probe, self.plug])
+        self.assertEqual(CoPurchase.recommend([self.station, self.plug]), [])
+        self.assertEqual(CoPurchase.recommend([self.station, self.kit], limit=1), [self.probe])
+        self.probe.is_active = False
+        self.probe.save()
+        self.assertEqual(CoPurchase.recommend([self.station, self.kit]), [self.plug])
+
+
+fetched_urls = []
+
+
+def fixture_image(url):
+    """IMAGE_PROXY_FETCHER stand-in: a small PNG, whatever the URL"""
+    fetched_urls.append(url)
+    return image_bytes((64, 48))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_PROXY_FETCHER='projects.tests.fixture_image')
+class ImageProxyTests(TestCase):
+    source = 'https://drive.google.com/file/d/abc123/view'
+
+    def setUp(self):
+        fetched_urls.clear()
+
+    def test_token_round_trips_and_rejects_tampering(self):
+        url = proxy_url(self.source)
+        token = url.rstrip('/').rsplit('/', 1)[1]
+        self.assertEqual(source_url(token), self.source)
+        self.assertIsNone(source_url(token[:-1] + ('A' if token[-1] != 'A' else 'B')))
+        self.assertEqual(self.client.get(url.replace(token, token + 'x')).status_code, 404)
+        self.assertFalse(ExternalImage.objects.exists())
+
+    def test_redirects_until_fetched_then_serves_the_local_copy(self):
+        url = proxy_url(self.source)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://lh3.googleusercontent.com/d/abc123=w800')
+        self.client.get(url)
+        self.assertEqual(ExternalImage.objects.count(), 1)
+
+        call_command('process_images', '--once', stdout=io.StringIO())
+        self.assertEqual(fetched_urls, ['https://lh3.googleusercontent.com/d/abc123=w800'])
+
+        response = self.client.get(url, HTTP_ACCEPT='image/webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('max-age', response['Cache-Control'])
+        b''.join(response.streaming_content)
+        response = self.client.get(url, HTTP_ACCEPT='image/webp', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(fetched_urls, ['https://lh3.googleusercontent.com/d/abc123=w800'])
+
+
+class FixtureSite(BaseHTTPRequestHandler):
+    """Serves `pages` with ETags, answering If-None-Match with 304"""
+    pages = {}
+
+    def do_GET(self):
+        body, etag = self.pages.get(self.path, (None, None))
+        if body is None:
+            self.send_error(404)
+            return
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class CrawlerTests(SimpleTestCase):
+    def setUp(self):
+        FixtureSite.pages = {
+            '/': ('<a href="/kits">Kits</a> <a href="/video">Video</a> <a href="/logo.png">Logo</a>', '"home"'),
+            '/kits': ('<img src="/media/kit.jpg" alt="Kit"> <a href="/">Home</a>', '"kits-1"'),
+            '/video': ('<video src="/media/demo.mp4"></video>', '"video"'),
+        }
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureSite)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.output = os.path.join(directory, 'pages.jsonl')
+        self.args = [
+            '--base-url', f'http://127.0.0.1:{self.server.server_port}/',
+            '--output', self.output,
+            '--state', os.path.join(directory, 'state.json'),
+            '--rate', '0',
+            '--workers', '2',
+        ]
+
+    def records(self):
+        with open(self.output, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_crawls_site_then_revisits_conditionally(self):
+        counts = scrape_devam.main(self.args)
+        self.assertEqual(counts, {'changed': 3, 'unchanged': 0, 'failed': 0})
+        kits = next(record for record in self.records() if record['url'].endswith('/kits'))
+        self.assertEqual(kits['images'][0]['alt'], 'Kit')
+
+        counts = scrape_devam.main(self.args)
+        self.assertEqual(counts, {'changed': 0, 'unchanged': 3, 'failed': 0})
+
+        FixtureSite.pages['/kits'] = ('<img src="/media/kit-v2.jpg"> <a href="/">Home</a>', '"kits-2"')
+        counts = scrape_devam.main(self.args)
+        self.assertEqual(counts, {'changed': 1, 'unchanged': 2, 'failed': 0})
+        records = self.records()
+        self.assertEqual(len(records), 3)
+        kits = next(record for record in records if record['url'].endswith('/kits'))
+        self.assertTrue(kits['images'][0]['url'].endswith('/media/kit-v2.jpg'))
+
+    def test_max_pages_resumes_on_next_run(self):
+        scrape_devam.main(self.args + ['--max-pages', '1', '--workers', '1'])
+        self.assertEqual(len(self.records()), 1)
+        scrape_devam.main(self.args)
+        self.assertEqual(sorted(record['url'].rsplit('/', 1)[1] for record in self.records()), ['', 'kits', 'video'])
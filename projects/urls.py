@@ -8,6 +8,8 @@ urlpatterns = [
     path('project/<slug:slug>/', views.ProjectDetailView.as_view(), name='project_detail'),
     path('category/<slug:slug>/', views.CategoryView.as_view(), name='category_projects'),
     path('search/', views.SearchView.as_view(), name='search'),
+    path('search/suggest/', views.search_suggestions, name='search_suggestions'),
+    path('images/proxy/<str:token>/', views.image_proxy, name='image_proxy'),
     
     # Cart functionality
     path('cart/', views.CartView.as_view(), name='cart'),
@@ -1,11 +1,22 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import ListView, DetailView, TemplateView
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Q
+from django.http import FileResponse, Http404, JsonResponse
+from django.db.models import Case, F, Q, When
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_POST
-from .models import Project, Category, Cart, CartItem
+from django.core.files.storage import default_storage
+from django.utils.cache import add_never_cache_headers, get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_GET, require_POST
+import os
+import time
+from .models import Project, Category, Cart, CartItem, CatalogEntry, CoPurchase, ExternalImage
+from .autocomplete import suggest
+from .facets import apply_facets, get_facets
+from .fuzzy import fuzzy_search
+from .proxy import choose_derivative, source_url
+from .result_cache import CachedResults, cached_result, result_ids
+from .search_analytics import record_search
 
 
 class HomeView(TemplateView):
@@ -13,24 +24,62 @@ class HomeView(TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['featured_projects'] = Project.objects.filter(is_active=True)[:8]
+        context['featured_projects'] = CatalogEntry.objects.all()[:8]
         context['categories'] = Category.objects.all()[:6]
         return context
 
 
-class ProjectListView(ListView):
-    model = Project
+class CachedResultsMixin:
+    """
+    Caches the ids a list view's query matches (projects.result_cache), so
+    a repeated query only loads the rows of the page shown.
+
+    Views implement filter_results(). Only active products have a
+    CatalogEntry, and deactivating one removes its entry, so cached ids of a
+    product deactivated since just drop out when the page is loaded.
+    self.matches is the filtered CatalogEntry queryset, for facet counts.
+    """
+    results_namespace = None
+
+    def filter_results(self):
+        """
+        (queryset, extra) for the current request: the CatalogEntry rows it
+        matches, in order, and a dict of values worked out along the way that
+        should be cached with them (available as self.results).
+        """
+        raise NotImplementedError(f'{type(self).__name__} must implement filter_results()')
+
+    def compute_results(self):
+        queryset, extra = self.filter_results()
+        self._filtered = queryset
+        return {**extra, 'ids': result_ids(queryset)}
+
+    def get_queryset(self):
+        self._filtered = None
+        self.results = cached_result(self.results_namespace, self.request.GET, self.compute_results)
+        ids = self.results['ids']
+        if ids is None:
+            # Too many to cache: page through the query itself
+            if self._filtered is None:
+                self._filtered, extra = self.filter_results()
+            self.matches = self._filtered
+            return self._filtered
+        self.matches = CatalogEntry.objects.filter(pk__in=ids)
+        return CachedResults(ids, CatalogEntry.objects.all())
+
+
+class ProjectListView(CachedResultsMixin, ListView):
+    model = CatalogEntry
     template_name = 'projects/project_list.html'
     context_object_name = 'projects'
     paginate_by = 12
+    results_namespace = 'list'
     
-    def get_queryset(self):
-        queryset = Project.objects.filter(is_active=True).select_related('category')
+    def filter_results(self):
+        queryset = CatalogEntry.objects.all()
         
-        # Filter by category
-        category = self.request.GET.get('category')
-        if category:
-            queryset = queryset.filter(category__slug=category)
+        # Filter by category, price bucket, delivery type and tag
+        queryset = apply_facets(queryset, self.request.GET)
         
         # Filter by price range
         min_price = self.request.GET.get('min_price')
@@ -44,14 +93,18 @@ class ProjectListView(ListView):
         sort_by = self.request.GET.get('sort', '-created_at')
         if sort_by in ['price', '-price', 'title', '-title', 'created_at', '-created_at']:
             queryset = queryset.order_by(sort_by)
+        elif sort_by == 'sales_rank':
+            # Entries added since the last ranking have none yet
+            queryset = queryset.order_by(F('sales_rank').asc(nulls_last=True), '-created_at')
         
-        return queryset
+        return queryset, {}
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['categories'] = Category.objects.all()
         context['current_category'] = self.request.GET.get('category')
         context['current_sort'] = self.request.GET.get('sort', '-created_at')
+        context['facets'] = get_facets(self.matches, self.request.GET, self.results_namespace, self.request.path)
         return context
 
 
@@ -65,22 +118,20 @@ class ProjectDetailView(DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['related_projects'] = Project.objects.filter(
-            category=self.object.category, 
-            is_active=True
-        ).exclude(id=self.object.id)[:4]
+        context['related_projects'] = self.object.get_related_projects(limit=4)
+        context['cross_sells'] = self.object.get_cross_sells(limit=4)
         return context
 
 
 class CategoryView(ListView):
-    model = Project
+    model = CatalogEntry
     template_name = 'projects/category_projects.html'
     context_object_name = 'projects'
     paginate_by = 12
     
     def get_queryset(self):
         self.category = get_object_or_404(Category, slug=self.kwargs['slug'])
-        return Project.objects.filter(category=self.category, is_active=True)
+        return CatalogEntry.objects.filter(category_id=self.category.pk)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -88,30 +139,105 @@ class CategoryView(ListView):
         return context
 
 
-class SearchView(ListView):
-    model = Project
+class SearchView(CachedResultsMixin, ListView):
+    model = CatalogEntry
     template_name = 'projects/search_results.html'
     context_object_name = 'projects'
     paginate_by = 12
+    results_namespace = 'search'
+    
+    def get(self, request, *args, **kwargs):
+        started = time.perf_counter()
+        response = super().get(request, *args, **kwargs)
+        # Log each search once, not again for every further page of it
+        if request.GET.get('page', '1') == '1':
+            record_search(
+                request.GET.get('q', ''),
+                response.context_data['paginator'].count,
+                (time.perf_counter() - started) * 1000,
+                fuzzy=self.fuzzy,
+            )
+        return response
     
     def get_queryset(self):
+        if not self.request.GET.get('q'):
+            self.fuzzy = False
+            return CatalogEntry.objects.none()
+        queryset = super().get_queryset()
+        self.fuzzy = self.results['fuzzy']
+        return queryset
+    
+    def filter_results(self):
         query = self.request.GET.get('q')
-        if query:
-            return Project.objects.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(tags__icontains=query) |
-                Q(category__name__icontains=query),
-                is_active=True
-            ).select_related('category')
-        return Project.objects.none()
+        # fuzzy=1 always matches approximately, fuzzy=0 never; by default
+        # only when the exact search finds nothing
+        fuzzy = self.request.GET.get('fuzzy')
+        queryset = CatalogEntry.objects.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(tags__icontains=query) |
+            Q(category_name__icontains=query)
+        )
+        used_fuzzy = fuzzy == '1' or (fuzzy != '0' and not queryset.exists())
+        if used_fuzzy:
+            ids = fuzzy_search(Project.objects.filter(is_active=True), query)
+            queryset = CatalogEntry.objects.filter(pk__in=ids).order_by(
+                Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)], default=len(ids))
+            )
+        return apply_facets(queryset, self.request.GET), {'fuzzy': used_fuzzy}
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['query'] = self.request.GET.get('q', '')
+        context['fuzzy'] = self.fuzzy
+        if context['query']:
+            context['facets'] = get_facets(self.matches, self.request.GET, self.results_namespace, self.request.path)
         return context
 
 
+@require_GET
+def search_suggestions(request):
+    """Autocomplete for the search box, answered from the in-memory prefix index"""
+    query = request.GET.get('q', '')[:100]
+    response = JsonResponse({'query': query, 'suggestions': suggest(query)})
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
+@require_GET
+def image_proxy(request, token):
+    """Serve an external image from our storage once the worker has fetched it"""
+    url = source_url(token)
+    if url is None:
+        raise Http404("Unknown image")
+    
+    image = ExternalImage.register(url)
+    mime, path = None, None
+    if image.image_status == 'ready':
+        width = request.GET.get('w')
+        mime, path = choose_derivative(
+            image.image_derivatives,
+            request.headers.get('Accept', ''),
+            int(width) if width and width.isdigit() else None,
+        )
+    
+    if path is None:
+        # Not fetched yet, or the fetch failed: send the browser to the source meanwhile
+        response = redirect(Project.convert_google_drive_url(url))
+        add_never_cache_headers(response)
+        return response
+    
+    # Derivative names carry the content digest, so they make a strong validator
+    etag = f'"{os.path.splitext(os.path.basename(path))[0]}-{mime.split("/")[1]}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(default_storage.open(path), content_type=mime)
+        response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.IMAGE_PROXY_MAX_AGE)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
 class CartView(TemplateView):
     template_name = 'projects/cart.html'
     
@@ -119,7 +245,9 @@ class CartView(TemplateView):
         context = super().get_context_data(**kwargs)
         cart = self.get_cart()
         context['cart'] = cart
-        context['cart_items'] = cart.items.all() if cart else []
+        cart_items = list(cart.items.all()) if cart else []
+        context['cart_items'] = cart_items
+        context['cross_sells'] = CoPurchase.recommend([item.project_id for item in cart_items]) if cart_items else []
         return context
     
     def get_cart(self):
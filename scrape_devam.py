@@ -1,162 +1,288 @@
-import requests
-from bs4 import BeautifulSoup
+#!/usr/bin/env python3
+"""
+Crawl devamproject.com for image and video URLs.
+
+Pages on the site are fetched concurrently, but never faster than --rate
+requests per second. Revisits send If-None-Match/If-Modified-Since so
+unchanged pages cost a 304. Crawl state is saved to --state, so an
+interrupted crawl resumes where it stopped. Each fetched page is appended
+to --output as one JSON line, and at the end of a run the file is compacted
+to the latest record per URL, so re-runs don't duplicate pages:
+
+    python scrape_devam.py --workers 4 --max-pages 200
+    python scrape_devam.py --base-url http://127.0.0.1:8000   # local fixture site
+"""
+import argparse
 import json
-from urllib.parse import urljoin, urlparse
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from urllib.parse import urldefrag, urljoin, urlparse
 
-def scrape_devam_project():
-    """Scrape images and video URLs from devamproject.com"""
-    
-    base_url = "https://www.devamproject.com"
-    
-    try:
-        # Make request with headers to avoid blocking
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        print(f"Fetching content from {base_url}...")
-        response = requests.get(base_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        print(f"Status code: {response.status_code}")
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract image URLs
-        print("\nExtracting images...")
-        images = []
-        img_tags = soup.find_all('img')
-        
-        for img in img_tags:
-            src = img.get('src')
-            if src:
-                # Convert relative URLs to absolute URLs
-                full_url = urljoin(base_url, src)
-                
-                # Get alt text and other attributes
-                alt_text = img.get('alt', '')
-                title = img.get('title', '')
-                
-                images.append({
-                    'url': full_url,
-                    'alt': alt_text,
-                    'title': title,
-                    'original_src': src
-                })
-        
-        # Extract video URLs
-        print("Extracting videos...")
-        videos = []
-        
-        # Check for video tags
-        video_tags = soup.find_all('video')
-        for video in video_tags:
-            src = video.get('src')
+import requests
+from bs4 import BeautifulSoup
+
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Links to these are assets, not pages worth fetching
+SKIP_EXTENSIONS = (
+    '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.avif', '.ico',
+    '.css', '.js', '.pdf', '.zip', '.mp4', '.webm', '.woff', '.woff2', '.ttf',
+)
+
+# Save crawl state after this many pages, so a crash loses little work
+STATE_SAVE_INTERVAL = 20
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--base-url', default='https://www.devamproject.com', help='Site to crawl')
+    parser.add_argument('--output', default='devam_scraped_data.jsonl', help='JSONL file of results, one record per page')
+    parser.add_argument('--state', default='devam_crawl_state.json', help='Crawl state for resume and conditional requests')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent requests')
+    parser.add_argument('--rate', type=float, default=2.0, help='Maximum requests per second across all workers')
+    parser.add_argument('--max-pages', type=int, default=200, help='Pages fetched per run')
+    parser.add_argument('--timeout', type=float, default=10, help='Request timeout in seconds')
+    parser.add_argument('--restart', action='store_true', help='Ignore an interrupted crawl and start from --base-url')
+    return parser.parse_args(argv)
+
+
+class RateLimiter:
+    """Spaces requests from all threads at least 1/rate seconds apart"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def extract_media(html, page_url):
+    """Return (images, videos, links) found in a page"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    images = []
+    for img in soup.find_all('img'):
+        src = img.get('src')
+        if src:
+            images.append({
+                'url': urljoin(page_url, src),
+                'alt': img.get('alt', ''),
+                'title': img.get('title', ''),
+                'original_src': src,
+            })
+
+    videos = []
+    for video in soup.find_all('video'):
+        src = video.get('src')
+        if src:
+            videos.append({'url': urljoin(page_url, src), 'type': 'video', 'original_src': src})
+        for source in video.find_all('source'):
+            src = source.get('src')
             if src:
-                full_url = urljoin(base_url, src)
-                videos.append({
-                    'url': full_url,
-                    'type': 'video',
-                    'original_src': src
-                })
-            
-            # Check for source tags within video
-            source_tags = video.find_all('source')
-            for source in source_tags:
-                src = source.get('src')
-                if src:
-                    full_url = urljoin(base_url, src)
-                    videos.append({
-                        'url': full_url,
-                        'type': source.get('type', 'video'),
-                        'original_src': src
-                    })
-        
-        # Check for iframe videos (YouTube, Vimeo, etc.)
-        iframe_tags = soup.find_all('iframe')
-        for iframe in iframe_tags:
-            src = iframe.get('src')
-            if src and ('youtube' in src or 'vimeo' in src or 'video' in src.lower()):
-                videos.append({
-                    'url': src,
-                    'type': 'iframe',
-                    'original_src': src
-                })
-        
-        # Results summary
-        print(f"\nFound {len(images)} images and {len(videos)} videos")
-        
-        # Create data structure
-        scraped_data = {
-            'source_url': base_url,
-            'scraped_at': response.headers.get('date', ''),
+                videos.append({'url': urljoin(page_url, src), 'type': source.get('type', 'video'), 'original_src': src})
+
+    # Embedded players (YouTube, Vimeo, etc.)
+    for iframe in soup.find_all('iframe'):
+        src = iframe.get('src')
+        if src and ('youtube' in src or 'vimeo' in src or 'video' in src.lower()):
+            videos.append({'url': src, 'type': 'iframe', 'original_src': src})
+
+    links = []
+    for anchor in soup.find_all('a', href=True):
+        link = urldefrag(urljoin(page_url, anchor['href']))[0]
+        if link.startswith(('http://', 'https://')):
+            links.append(link)
+    return images, videos, links
+
+
+def crawlable(url, host):
+    parsed = urlparse(url)
+    return parsed.netloc == host and not parsed.path.lower().endswith(SKIP_EXTENSIONS)
+
+
+def load_state(path):
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {'pages': {}, 'pending': [], 'visited': []}
+
+
+def compact_output(path):
+    """Rewrite the output file keeping only the latest record of each URL, in first-seen order"""
+    if not os.path.exists(path):
+        return 0
+    records = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                records[record['url']] = record
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for record in records.values():
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+def save_state(path, state):
+    # Write then rename, so an interrupted save never leaves a truncated file
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+class Crawler:
+    def __init__(self, args):
+        self.args = args
+        self.host = urlparse(args.base_url).netloc
+        self.limiter = RateLimiter(args.rate)
+        self.local = threading.local()
+
+    def get_session(self):
+        # requests sessions are not thread-safe, so each worker keeps its own
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            self.local.session.headers.update(HEADERS)
+        return self.local.session
+
+    def fetch(self, url, known):
+        """
+        Fetch one page, conditionally if it was seen before.
+
+        Returns the page's new state and, unless it was unchanged, its record
+        for the output file.
+        """
+        headers = {}
+        if known.get('etag'):
+            headers['If-None-Match'] = known['etag']
+        if known.get('last_modified'):
+            headers['If-Modified-Since'] = known['last_modified']
+
+        self.limiter.wait()
+        response = self.get_session().get(url, headers=headers, timeout=self.args.timeout)
+        fetched_at = datetime.now(timezone.utc).isoformat()
+
+        if response.status_code == 304:
+            return {**known, 'checked_at': fetched_at, 'status': 304}, None
+        response.raise_for_status()
+
+        page = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'checked_at': fetched_at,
+            'status': response.status_code,
+            'links': [],
+        }
+        if 'html' not in response.headers.get('Content-Type', 'text/html'):
+            return page, None
+
+        images, videos, links = extract_media(response.content, response.url)
+        page['links'] = sorted({link for link in links if crawlable(link, self.host)})
+        record = {
+            'url': url,
+            'fetched_at': fetched_at,
             'images': images,
             'videos': videos,
-            'total_images': len(images),
-            'total_videos': len(videos)
         }
-        
-        return scraped_data
-        
-    except requests.RequestException as e:
-        print(f"Error fetching the webpage: {e}")
-        return None
-    except Exception as e:
-        print(f"Error parsing the webpage: {e}")
-        return None
-
-def save_data_to_json(data, filename='devam_scraped_data.json'):
-    """Save scraped data to JSON file"""
-    try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"\nData saved to {filename}")
-    except Exception as e:
-        print(f"Error saving data: {e}")
-
-def display_results(data):
-    """Display the scraped results"""
-    if not data:
-        return
-    
-    print(f"\n{'='*50}")
-    print(f"SCRAPING RESULTS FROM {data['source_url']}")
-    print(f"{'='*50}")
-    
-    print(f"\nIMAGES FOUND ({data['total_images']}):")
-    print("-" * 30)
-    for i, img in enumerate(data['images'][:10], 1):  # Show first 10
-        print(f"{i}. {img['url']}")
-        if img['alt']:
-            print(f"   Alt: {img['alt']}")
-        if img['title']:
-            print(f"   Title: {img['title']}")
-        print()
-    
-    if len(data['images']) > 10:
-        print(f"... and {len(data['images']) - 10} more images")
-    
-    print(f"\nVIDEOS FOUND ({data['total_videos']}):")
-    print("-" * 30)
-    for i, video in enumerate(data['videos'], 1):
-        print(f"{i}. {video['url']}")
-        print(f"   Type: {video['type']}")
-        print()
+        return page, record
+
+    def run(self):
+        args = self.args
+        state = load_state(args.state)
+        if args.restart or not state['pending']:
+            state['pending'] = [args.base_url]
+            state['visited'] = []
+
+        frontier = deque(state['pending'])
+        seen = set(state['visited']) | set(frontier)
+        visited = list(state['visited'])
+        counts = {'changed': 0, 'unchanged': 0, 'failed': 0}
+        in_flight = {}
+        done = saved_at = 0
+
+        print(f"Crawling {args.base_url} with {args.workers} workers "
+              f"({len(frontier)} queued, {len(visited)} already visited)")
+
+        with open(args.output, 'a', encoding='utf-8') as output, \
+                ThreadPoolExecutor(max_workers=args.workers) as executor:
+            try:
+                while frontier or in_flight:
+                    while frontier and len(in_flight) < args.workers and done + len(in_flight) < args.max_pages:
+                        url = frontier.popleft()
+                        known = state['pages'].get(url, {})
+                        in_flight[executor.submit(self.fetch, url, known)] = url
+                    if not in_flight:
+                        break
+
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        url = in_flight.pop(future)
+                        done += 1
+                        visited.append(url)
+                        try:
+                            page, record = future.result()
+                        except requests.RequestException as e:
+                            counts['failed'] += 1
+                            print(f"Error fetching {url}: {e}")
+                            continue
+
+                        state['pages'][url] = page
+                        if record is None:
+                            counts['unchanged' if page['status'] == 304 else 'changed'] += 1
+                        else:
+                            counts['changed'] += 1
+                            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                            output.flush()
+                            print(f"{url}: {len(record['images'])} images, {len(record['videos'])} videos")
+
+                        # Links of unchanged pages come from the stored state
+                        for link in page.get('links', []):
+                            if link not in seen:
+                                seen.add(link)
+                                frontier.append(link)
+
+                    # Several pages can finish per step, so compare against the last save
+                    if done - saved_at >= STATE_SAVE_INTERVAL:
+                        state.update(pending=list(in_flight.values()) + list(frontier), visited=visited)
+                        save_state(args.state, state)
+                        saved_at = done
+            except KeyboardInterrupt:
+                print("\nInterrupted; saving crawl state for resume")
+                for future in in_flight:
+                    future.cancel()
+                state.update(pending=list(in_flight.values()) + list(frontier), visited=visited)
+                save_state(args.state, state)
+                raise
+
+        # Pages left over past --max-pages are picked up by the next run
+        state.update(pending=list(frontier), visited=visited if frontier else [])
+        save_state(args.state, state)
+        compact_output(args.output)
+        print(f"\nFetched {done} pages: {counts['changed']} new or changed, "
+              f"{counts['unchanged']} unchanged, {counts['failed']} failed; "
+              f"{len(frontier)} left queued")
+        return counts
+
+
+def main(argv=None):
+    return Crawler(parse_args(argv)).run()
+
 
 if __name__ == "__main__":
-    print("Scraping devamproject.com for images and videos...")
-    
-    # Scrape the data
-    data = scrape_devam_project()
-    
-    if data:
-        # Display results
-        display_results(data)
-        
-        # Save to JSON file
-        save_data_to_json(data)
-        
-        print(f"\nScraping completed successfully!")
-        print(f"You can find the detailed data in 'devam_scraped_data.json'")
-    else:
-        print("Scraping failed. Please check the website URL and try again.")
+    main()